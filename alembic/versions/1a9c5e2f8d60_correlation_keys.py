@@ -0,0 +1,32 @@
+"""Correlation keys of blocked tasks
+
+Revision ID: 1a9c5e2f8d60
+Revises: e47a0c93b5d8
+Create Date: 2026-10-19 15:21:09.614230
+"""
+
+import sqlalchemy as sql
+
+from alembic import op
+
+revision = "1a9c5e2f8d60"
+down_revision = "e47a0c93b5d8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add tasks.correlation_key column."""
+    op.add_column("tasks", sql.Column("correlation_key", sql.String, nullable=True))
+    op.create_index(
+        "ix_tasks_correlation_key",
+        "tasks",
+        ["correlation_key"],
+        postgresql_where=sql.text("correlation_key IS NOT NULL"),
+    )
+
+
+def downgrade():
+    """Drop tasks.correlation_key column."""
+    op.drop_index("ix_tasks_correlation_key", table_name="tasks")
+    op.drop_column("tasks", "correlation_key")
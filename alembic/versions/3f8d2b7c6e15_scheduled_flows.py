@@ -0,0 +1,55 @@
+"""Delayed and scheduled flows
+
+Revision ID: 3f8d2b7c6e15
+Revises: 1a9c5e2f8d60
+Create Date: 2026-10-19 16:02:47.318520
+"""
+
+import sqlalchemy as sql
+
+from alembic import op
+
+revision = "3f8d2b7c6e15"
+down_revision = "1a9c5e2f8d60"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add schedules table, flows.run_at column, keep deferred tasks unindexed."""
+    op.create_table(
+        "schedules",
+        sql.Column("key", sql.String, primary_key=True, nullable=False),
+        sql.Column("next_run_at", sql.DateTime(), nullable=False),
+    )
+
+    op.add_column("flows", sql.Column("run_at", sql.DateTime(), nullable=True))
+
+    op.drop_index("ix_tasks_flow_id_pending", table_name="tasks")
+    op.create_index(
+        "ix_tasks_flow_id_pending",
+        "tasks",
+        ["flow_id"],
+        postgresql_where=sql.text("status = 'PENDING' AND retry_at IS NULL"),
+    )
+    op.create_index(
+        "ix_tasks_retry_at",
+        "tasks",
+        ["retry_at"],
+        postgresql_where=sql.text("retry_at IS NOT NULL"),
+    )
+
+
+def downgrade():
+    """Drop schedules table, flows.run_at column, index deferred tasks."""
+    op.drop_index("ix_tasks_retry_at", table_name="tasks")
+    op.drop_index("ix_tasks_flow_id_pending", table_name="tasks")
+    op.create_index(
+        "ix_tasks_flow_id_pending",
+        "tasks",
+        ["flow_id"],
+        postgresql_where=sql.text("status = 'PENDING'"),
+    )
+
+    op.drop_column("flows", "run_at")
+    op.drop_table("schedules")
@@ -0,0 +1,69 @@
+"""Indexes matching actual query patterns
+
+Revision ID: 5d1f3a9e7c42
+Revises: c9066a753b93
+Create Date: 2026-10-19 09:12:04.511873
+"""
+
+import sqlalchemy as sql
+
+from alembic import op
+
+revision = "5d1f3a9e7c42"
+down_revision = "c9066a753b93"
+branch_labels = None
+depends_on = None
+
+
+# Single column indexes that no query filters or sorts on. Each one costs a
+# write on every task insert and status transition.
+unused_task_indexes = ("name", "started_at", "updated_at", "finished_at", "ordering")
+
+
+def upgrade():
+    """Replace single column task indexes with composite and partial ones."""
+    # Serves the `selectin` load of `Flow.tasks`, which filters on flow_id and
+    # sorts by ordering. Supersedes the plain flow_id index.
+    op.create_index("ix_tasks_flow_id_ordering", "tasks", ["flow_id", "ordering"])
+    op.drop_index("ix_tasks_flow_id", table_name="tasks")
+
+    # Serve the dequeue query: a join on pending tasks, and an `EXISTS`
+    # subquery on blocked tasks of the same flow. Both statuses are a small
+    # fraction of the table, so partial indexes stay small.
+    op.create_index(
+        "ix_tasks_flow_id_pending",
+        "tasks",
+        ["flow_id"],
+        postgresql_where=sql.text("status = 'PENDING'"),
+    )
+    op.create_index(
+        "ix_tasks_flow_id_name_blocked",
+        "tasks",
+        ["flow_id", "name"],
+        postgresql_where=sql.text("status = 'BLOCKED'"),
+    )
+
+    # A low cardinality status index is never chosen over the partial ones.
+    op.drop_index("ix_tasks_status", table_name="tasks")
+
+    for column in unused_task_indexes:
+        op.drop_index(f"ix_tasks_{column}", table_name="tasks")
+
+    # Serves flow listings filtered by name and sorted by creation time.
+    op.create_index("ix_flows_name_created_at", "flows", ["name", "created_at"])
+    op.drop_index("ix_flows_name", table_name="flows")
+
+
+def downgrade():
+    """Restore the initial single column indexes."""
+    op.create_index("ix_flows_name", "flows", ["name"])
+    op.drop_index("ix_flows_name_created_at", table_name="flows")
+
+    for column in unused_task_indexes:
+        op.create_index(f"ix_tasks_{column}", "tasks", [column])
+
+    op.create_index("ix_tasks_status", "tasks", ["status"])
+    op.drop_index("ix_tasks_flow_id_name_blocked", table_name="tasks")
+    op.drop_index("ix_tasks_flow_id_pending", table_name="tasks")
+    op.create_index("ix_tasks_flow_id", "tasks", ["flow_id"])
+    op.drop_index("ix_tasks_flow_id_ordering", table_name="tasks")
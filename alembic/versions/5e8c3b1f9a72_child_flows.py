@@ -0,0 +1,35 @@
+"""Child flows
+
+Revision ID: 5e8c3b1f9a72
+Revises: d2f7a4c61e09
+Create Date: 2026-10-19 19:48:31.904117
+"""
+
+import sqlalchemy as sql
+import sqlalchemy.dialects.postgresql as psql
+
+from alembic import op
+
+revision = "5e8c3b1f9a72"
+down_revision = "d2f7a4c61e09"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add flows.parent_id column."""
+    op.add_column(
+        "flows", sql.Column("parent_id", psql.UUID(as_uuid=True), nullable=True)
+    )
+    op.create_index(
+        "ix_flows_parent_id",
+        "flows",
+        ["parent_id"],
+        postgresql_where=sql.text("parent_id IS NOT NULL"),
+    )
+
+
+def downgrade():
+    """Drop flows.parent_id column."""
+    op.drop_index("ix_flows_parent_id", table_name="flows")
+    op.drop_column("flows", "parent_id")
@@ -0,0 +1,34 @@
+"""Task checkpoints
+
+Revision ID: 7c5a9e1f2b84
+Revises: b6e41d9a0c23
+Create Date: 2026-10-19 17:31:52.470963
+"""
+
+import sqlalchemy as sql
+import sqlalchemy.dialects.postgresql as psql
+
+from alembic import op
+
+revision = "7c5a9e1f2b84"
+down_revision = "b6e41d9a0c23"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add checkpoints table."""
+    op.create_table(
+        "checkpoints",
+        # Not a foreign key, as checking it would wait on the Task's row lock.
+        sql.Column(
+            "task_id", psql.UUID(as_uuid=True), primary_key=True, nullable=False
+        ),
+        sql.Column("state", psql.JSONB, nullable=False),
+        sql.Column("updated_at", sql.DateTime(), nullable=False),
+    )
+
+
+def downgrade():
+    """Drop checkpoints table."""
+    op.drop_table("checkpoints")
@@ -0,0 +1,36 @@
+"""Blob store for large task outputs
+
+Revision ID: 8b2e6f0d4a17
+Revises: 5d1f3a9e7c42
+Create Date: 2026-10-19 11:40:27.902114
+"""
+
+import sqlalchemy as sql
+
+from alembic import op
+
+revision = "8b2e6f0d4a17"
+down_revision = "5d1f3a9e7c42"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add blobs table."""
+    op.create_table(
+        "blobs",
+        sql.Column("digest", sql.String, primary_key=True, nullable=False),
+        sql.Column("data", sql.LargeBinary, nullable=False),
+        sql.Column("size", sql.Integer, nullable=False),
+        sql.Column(
+            "created_at",
+            sql.DateTime(),
+            nullable=False,
+            server_default=sql.text("now()"),
+        ),
+    )
+
+
+def downgrade():
+    """Drop blobs table."""
+    op.drop_table("blobs")
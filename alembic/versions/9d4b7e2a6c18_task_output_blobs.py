@@ -0,0 +1,32 @@
+"""Index of blobs referred to by task outputs
+
+Revision ID: 9d4b7e2a6c18
+Revises: f3c8d1a6b295
+Create Date: 2026-10-19 23:48:12.650391
+"""
+
+import sqlalchemy as sql
+
+from alembic import op
+
+revision = "9d4b7e2a6c18"
+down_revision = "f3c8d1a6b295"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add tasks index on blob references."""
+    # Serves finding whether any task still refers to a blob, once tasks are
+    # purged. Only outputs offloaded to blobs are indexed.
+    op.create_index(
+        "ix_tasks_output_blob",
+        "tasks",
+        [sql.text("(output ->> '$blob')")],
+        postgresql_where=sql.text("output ->> '$blob' IS NOT NULL"),
+    )
+
+
+def downgrade():
+    """Drop tasks index on blob references."""
+    op.drop_index("ix_tasks_output_blob", table_name="tasks")
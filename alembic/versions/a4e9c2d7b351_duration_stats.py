@@ -0,0 +1,35 @@
+"""Duration statistics
+
+Revision ID: a4e9c2d7b351
+Revises: 5e8c3b1f9a72
+Create Date: 2026-10-19 20:41:56.527803
+"""
+
+import sqlalchemy as sql
+import sqlalchemy.dialects.postgresql as psql
+
+from alembic import op
+
+revision = "a4e9c2d7b351"
+down_revision = "5e8c3b1f9a72"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add duration_stats table."""
+    op.create_table(
+        "duration_stats",
+        sql.Column("kind", sql.String(), primary_key=True, nullable=False),
+        sql.Column("name", sql.String(), primary_key=True, nullable=False),
+        sql.Column("count", sql.BigInteger(), nullable=False),
+        sql.Column("total", sql.Float(), nullable=False),
+        sql.Column("median", sql.Float(), nullable=True),
+        sql.Column("buckets", psql.JSONB(), nullable=False),
+        sql.Column("updated_at", sql.DateTime(), nullable=False),
+    )
+
+
+def downgrade():
+    """Drop duration_stats table."""
+    op.drop_table("duration_stats")
@@ -0,0 +1,28 @@
+"""Task attempts
+
+Revision ID: b6e41d9a0c23
+Revises: 3f8d2b7c6e15
+Create Date: 2026-10-19 16:48:05.902117
+"""
+
+import sqlalchemy as sql
+
+from alembic import op
+
+revision = "b6e41d9a0c23"
+down_revision = "3f8d2b7c6e15"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add tasks.attempt column."""
+    op.add_column(
+        "tasks",
+        sql.Column("attempt", sql.Integer, server_default="0", nullable=False),
+    )
+
+
+def downgrade():
+    """Drop tasks.attempt column."""
+    op.drop_column("tasks", "attempt")
@@ -0,0 +1,38 @@
+"""Task progress
+
+Revision ID: d2f7a4c61e09
+Revises: 7c5a9e1f2b84
+Create Date: 2026-10-19 19:12:08.316254
+"""
+
+import sqlalchemy as sql
+import sqlalchemy.dialects.postgresql as psql
+
+from alembic import op
+
+revision = "d2f7a4c61e09"
+down_revision = "7c5a9e1f2b84"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add task_progress table."""
+    op.create_table(
+        "task_progress",
+        # Not a foreign key, as checking it would wait on the Task's row lock.
+        sql.Column(
+            "task_id", psql.UUID(as_uuid=True), primary_key=True, nullable=False
+        ),
+        sql.Column("flow_id", psql.UUID(as_uuid=True), nullable=False),
+        sql.Column("fraction", sql.Float(), nullable=False),
+        sql.Column("detail", sql.String(), nullable=True),
+        sql.Column("updated_at", sql.DateTime(), nullable=False),
+    )
+    op.create_index("ix_task_progress_flow_id", "task_progress", ["flow_id"])
+
+
+def downgrade():
+    """Drop task_progress table."""
+    op.drop_index("ix_task_progress_flow_id", table_name="task_progress")
+    op.drop_table("task_progress")
@@ -0,0 +1,40 @@
+"""Rate limits and deferred tasks
+
+Revision ID: e47a0c93b5d8
+Revises: 8b2e6f0d4a17
+Create Date: 2026-10-19 14:03:51.228406
+"""
+
+import sqlalchemy as sql
+
+from alembic import op
+
+revision = "e47a0c93b5d8"
+down_revision = "8b2e6f0d4a17"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add rate_limits table, tasks.retry_at column."""
+    op.create_table(
+        "rate_limits",
+        sql.Column("key", sql.String, primary_key=True, nullable=False),
+        sql.Column("tokens", sql.Float, nullable=False),
+        sql.Column("updated_at", sql.DateTime(timezone=True), nullable=False),
+    )
+
+    op.add_column("tasks", sql.Column("retry_at", sql.DateTime(), nullable=True))
+    op.create_index(
+        "ix_tasks_flow_id_retry_at",
+        "tasks",
+        ["flow_id", "retry_at"],
+        postgresql_where=sql.text("retry_at IS NOT NULL"),
+    )
+
+
+def downgrade():
+    """Drop rate_limits table, tasks.retry_at column."""
+    op.drop_index("ix_tasks_flow_id_retry_at", table_name="tasks")
+    op.drop_column("tasks", "retry_at")
+    op.drop_table("rate_limits")
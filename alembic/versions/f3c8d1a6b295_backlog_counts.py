@@ -0,0 +1,30 @@
+"""Backlog counts
+
+Revision ID: f3c8d1a6b295
+Revises: a4e9c2d7b351
+Create Date: 2026-10-19 23:05:31.204518
+"""
+
+import sqlalchemy as sql
+
+from alembic import op
+
+revision = "f3c8d1a6b295"
+down_revision = "a4e9c2d7b351"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    """Add backlog_counts table."""
+    op.create_table(
+        "backlog_counts",
+        sql.Column("name", sql.String(), primary_key=True, nullable=False),
+        sql.Column("count", sql.BigInteger(), nullable=False),
+        sql.Column("counted_at", sql.DateTime(), nullable=False),
+    )
+
+
+def downgrade():
+    """Drop backlog_counts table."""
+    op.drop_table("backlog_counts")
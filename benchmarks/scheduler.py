@@ -0,0 +1,311 @@
+"""Simulates the scheduler on synthetic workloads, on a virtual clock.
+
+The real runners and flows are driven on the memory backend, within an event
+loop whose clock jumps ahead whenever all coroutines wait, so that simulated
+hours take seconds and runs are deterministic for a given seed. Flows of the
+example templates arrive at random, at a given rate and mix, with random
+priorities. Blocked flows are unblocked by correlation key, once blocked for a
+given delay.
+
+Throughput, queue waits and how each priority fares are reported. A task's
+queue wait is how long it was eligible before being run. Results may be saved
+as JSON, and compared with those of another commit:
+
+    python benchmarks/scheduler.py --save before.json
+    git checkout other && python benchmarks/scheduler.py --compare before.json
+
+Runners tick every `TICK_PERIOD` milliseconds, as configured.
+
+Run with `python benchmarks/scheduler.py`.
+"""
+
+import os
+
+# Simulate on the memory backend, keeping logs and progress writes at bay.
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["PROGRESS_MIN_INTERVAL"] = "0"
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+
+import argparse  # noqa: E402
+import asyncio  # noqa: E402
+import json  # noqa: E402
+import random  # noqa: E402
+import selectors  # noqa: E402
+import time  # noqa: E402
+import uuid  # noqa: E402
+from collections import defaultdict  # noqa: E402
+from datetime import datetime, timedelta  # noqa: E402
+from typing import Any, Dict, List  # noqa: E402
+
+import orch.config as conf  # noqa: E402
+import orch.durations as durations  # noqa: E402
+import orch.models.backends.memory as memory  # noqa: E402
+import orch.models.flow as flow_model  # noqa: E402
+import orch.models.task as task_model  # noqa: E402
+import orch.routes as routes  # noqa: E402
+from orch.models.backends import create  # noqa: E402
+from orch.models.flow import Flow  # noqa: E402
+from orch.models.status import Status  # noqa: E402
+
+# When virtual time starts.
+EPOCH = datetime(2000, 1, 1)
+
+
+class _Selector(selectors.DefaultSelector):
+    """Jumps the loop's clock ahead rather than waiting for timers."""
+
+    def select(self, timeout=None):
+        assert timeout is not None, "simulation stalled, with nothing scheduled"
+        self.loop.now += timeout
+        return super().select(0)
+
+
+class VirtualLoop(asyncio.SelectorEventLoop):
+    """An event loop on a virtual clock, in seconds since `EPOCH`."""
+
+    def __init__(self):
+        selector = _Selector()
+        super().__init__(selector)
+        selector.loop = self
+        self.now = 0.0
+
+    def time(self) -> float:
+        return self.now
+
+
+class _Datetime(datetime):
+    """Tells virtual time, in place of `datetime` in the modules simulated."""
+
+    @classmethod
+    def utcnow(cls) -> datetime:
+        return EPOCH + timedelta(seconds=asyncio.get_running_loop().time())
+
+
+def _flow_args(name: str, i: int, args) -> Dict[str, Any]:
+    if name == "example_large":
+        return {"wait_time": args.wait_time, "num_of_tasks": args.large_tasks}
+    if name == "example_blocked":
+        return {"correlation_key": f"simulated-{i}"}
+
+    return {"wait_time": args.wait_time}
+
+
+async def _unblock(
+    key: str, flow_id: uuid.UUID, delay: float, unblocked_at: Dict
+) -> None:
+    """Unblock a flow's task once it has been blocked for `delay` seconds."""
+    while key not in memory.store.correlated:
+        await asyncio.sleep(0.01)
+
+    await asyncio.sleep(delay)
+    unblocked_at[flow_id] = _Datetime.utcnow()
+    await routes._unblock(create(), {key: {"simulated": True}})
+
+
+async def _arrive(args, rng: random.Random, unblocked_at: Dict) -> None:
+    """Submit flows at random, as per the workload's rate and mix."""
+    names, weights = zip(*args.mix.items())
+    for i in range(args.flows):
+        await asyncio.sleep(rng.expovariate(args.rate))
+
+        name = rng.choices(names, weights)[0]
+        flow = Flow.from_req(
+            name, _flow_args(name, i, args), priority=rng.choice(args.priorities)
+        )
+        flow.created_at = _Datetime.utcnow()
+        for task in flow.tasks:
+            task.updated_at = flow.created_at
+
+        async with create() as backend:
+            await backend.insert([flow])
+            await backend.commit()
+
+        if name == "example_blocked":
+            key = flow.args["correlation_key"]
+            asyncio.create_task(
+                _unblock(key, flow.id, args.unblock_delay / 1000, unblocked_at)
+            )
+
+
+def _finished(flow: Flow) -> bool:
+    return flow.status() in (Status.SUCCESS, Status.FAILURE)
+
+
+async def _simulate(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    unblocked_at: Dict[uuid.UUID, datetime] = {}
+
+    for _ in range(args.runners):
+        await routes.run_tasks_periodically()
+
+    await _arrive(args, rng, unblocked_at)
+
+    # Let runners drain the queue, for as long as allowed.
+    deadline = asyncio.get_running_loop().time() + args.drain / 1000
+    while asyncio.get_running_loop().time() < deadline:
+        if all(_finished(flow) for flow in memory.store.flows.values()):
+            break
+        await asyncio.sleep(0.1)
+
+    return _report(list(memory.store.flows.values()), unblocked_at)
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Get a nearest rank percentile, in milliseconds."""
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] * 1000
+
+
+def _waits(flow: Flow, unblocked_at: Dict) -> List[float]:
+    """Get how long each of a flow's tasks run waited, in seconds."""
+    waits = []
+    ready_at = flow.created_at
+    for task in flow.tasks:
+        if task.started_at is None:
+            break
+
+        if task.name == "example_blocked" and flow.id in unblocked_at:
+            ready_at = unblocked_at[flow.id]
+        waits.append((task.started_at - ready_at).total_seconds())
+        ready_at = task.finished_at
+
+    return waits
+
+
+def _report(flows: List[Flow], unblocked_at: Dict) -> Dict[str, Any]:
+    finished = [flow for flow in flows if _finished(flow)]
+    ended_at = max(
+        (task.finished_at for flow in flows for task in flow.tasks if task.finished_at),
+        default=EPOCH,
+    )
+    duration = (ended_at - EPOCH).total_seconds() or 1.0
+    tasks_run = sum(1 for flow in flows for task in flow.tasks if task.finished_at)
+
+    by_priority = defaultdict(list)
+    for flow in flows:
+        by_priority[flow.priority].append(flow)
+
+    priorities = {}
+    all_waits = []
+    for priority, prioritized in sorted(by_priority.items(), reverse=True):
+        waits = [wait for flow in prioritized for wait in _waits(flow, unblocked_at)]
+        done = [flow for flow in prioritized if _finished(flow)]
+        turnarounds = [
+            (
+                max(task.finished_at for task in flow.tasks if task.finished_at)
+                - flow.created_at
+            ).total_seconds()
+            for flow in done
+        ]
+        all_waits += waits
+        priorities[str(priority)] = {
+            "flows": len(prioritized),
+            "finished": len(done),
+            "wait_mean_ms": 1000 * sum(waits) / max(len(waits), 1),
+            "wait_p50_ms": _percentile(waits, 0.5),
+            "wait_p99_ms": _percentile(waits, 0.99),
+            "turnaround_mean_ms": 1000 * sum(turnarounds) / max(len(turnarounds), 1),
+        }
+
+    return {
+        "duration_s": duration,
+        "flows": len(flows),
+        "flows_finished": len(finished),
+        "flows_failed": sum(1 for flow in finished if flow.status() == Status.FAILURE),
+        "tasks_run": tasks_run,
+        "throughput_tasks_per_s": tasks_run / duration,
+        "throughput_flows_per_s": len(finished) / duration,
+        "wait_mean_ms": 1000 * sum(all_waits) / max(len(all_waits), 1),
+        "wait_p50_ms": _percentile(all_waits, 0.5),
+        "wait_p99_ms": _percentile(all_waits, 0.99),
+        "priorities": priorities,
+    }
+
+
+def _print(results: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    def line(name, val, base):
+        delta = ""
+        if isinstance(base, (int, float)) and base:
+            delta = f"  ({(val - base) / base * 100:+.1f}%)"
+        print(f"{name:<32} {val:12.2f}{delta}")
+
+    for key, val in results.items():
+        if isinstance(val, (int, float)):
+            line(key, val, baseline.get(key))
+
+    for priority, stats in results["priorities"].items():
+        print(f"priority {priority}")
+        base = baseline.get("priorities", {}).get(priority, {})
+        for key, val in stats.items():
+            line(f"  {key}", val, base.get(key))
+
+
+def _mix(val: str) -> Dict[str, float]:
+    """Parse a mix of flow names and weights, e.g. `example=3,example_large=1`."""
+    mix = {}
+    for item in val.split(","):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight or 1)
+
+    return mix
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--flows", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=20.0, help="flows per second")
+    parser.add_argument(
+        "--mix",
+        type=_mix,
+        default=_mix("example=4,example_large=2,example_blocked=1,example_failure=1"),
+    )
+    parser.add_argument("--priorities", type=int, nargs="+", default=[0, 0, 0, 1, 5])
+    parser.add_argument("--runners", type=int, default=4)
+    parser.add_argument("--wait-time", type=int, default=50, help="task milliseconds")
+    parser.add_argument("--large-tasks", type=int, default=5)
+    parser.add_argument("--unblock-delay", type=int, default=2000, help="ms")
+    parser.add_argument("--drain", type=int, default=600000, help="ms, at most")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--policy", choices=durations.POLICIES, default="priority")
+    parser.add_argument("--save", help="save results as JSON to this path")
+    parser.add_argument("--compare", help="compare with results saved there")
+    args = parser.parse_args()
+
+    conf.scheduling_policy = args.policy
+
+    # Have the simulated modules tell virtual time.
+    for module in (flow_model, task_model, memory):
+        module.dt = _Datetime
+
+    loop = VirtualLoop()
+    asyncio.set_event_loop(loop)
+    started_at = time.perf_counter()
+    try:
+        results = loop.run_until_complete(_simulate(args))
+    finally:
+        for task in asyncio.all_tasks(loop):
+            task.cancel()
+        loop.run_until_complete(asyncio.sleep(0))
+        loop.close()
+
+    results["workload"] = {
+        key: val for key, val in vars(args).items() if key not in ("save", "compare")
+    }
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    _print(results, baseline)
+    print(f"{'wall time':<32} {time.perf_counter() - started_at:12.2f}s")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Compares JSON encoding of flows with the stdlib and `orch.serialization`.
+
+Both paths a flow takes are measured: writing a task output to a JSONB column,
+and rendering a `ResponseFlow` through the API. The stdlib baseline mirrors
+what orch did before `orch.serialization` existed.
+
+Run with `python benchmarks/serialization.py`.
+"""
+
+import argparse
+import json
+import timeit
+import uuid
+from datetime import datetime as dt
+
+from fastapi.encoders import jsonable_encoder
+
+import orch.schemas as schemas
+import orch.serialization as serialization
+from orch.models.flow import Flow
+from orch.models.status import Status
+
+
+def _default(unknown):
+    if isinstance(unknown, dt):
+        return unknown.isoformat()
+    raise TypeError(f"could not encode {unknown} to json")
+
+
+def _flow(num_of_tasks: int, output_size: int) -> Flow:
+    """Build a finished flow whose tasks all have sizeable outputs."""
+    flow = Flow.from_req(
+        "example_large", {"wait_time": 10, "num_of_tasks": num_of_tasks}
+    )
+    now = dt.utcnow()
+    flow.created_at = now
+    for task in flow.tasks:
+        task.status = Status.SUCCESS
+        task.updated_at = now
+        task.started_at = now
+        task.finished_at = now
+        task.output = {
+            "dummy_id": task.ordering,
+            "items": [
+                {"id": str(uuid.uuid4()), "at": now.isoformat(), "value": i * 0.5}
+                for i in range(output_size)
+            ],
+        }
+
+    return flow
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=50)
+    parser.add_argument("--output-size", type=int, default=100)
+    parser.add_argument("--number", type=int, default=200)
+    args = parser.parse_args()
+
+    flow = _flow(args.tasks, args.output_size)
+    output = flow.tasks[-1].output
+    response = schemas.ResponseFlow.from_model(flow)
+
+    cases = {
+        "jsonb write": (
+            lambda: json.dumps(output, default=_default),
+            lambda: serialization.dumps(output),
+        ),
+        "jsonb read": (
+            lambda: json.loads(json.dumps(output)),
+            lambda: serialization.loads(serialization.dumps(output)),
+        ),
+        "flow response": (
+            lambda: json.dumps(jsonable_encoder(response)).encode(),
+            lambda: serialization.dumpb(response.dict()),
+        ),
+    }
+
+    print(f"backend: {'orjson' if serialization.orjson else 'json'}")
+    for name, (before, after) in cases.items():
+        t_before = timeit.timeit(before, number=args.number) / args.number
+        t_after = timeit.timeit(after, number=args.number) / args.number
+        print(
+            f"{name:<14} before {t_before * 1e6:10.1f}us"
+            f"  after {t_after * 1e6:10.1f}us"
+            f"  speedup {t_before / t_after:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Measures how long starting orch takes, with and without loading templates.
+
+Each measurement runs in a fresh interpreter, so that nothing is imported
+beforehand. Templates are imported lazily, thus `import orch` alone should
+not grow with the number of registered flows and tasks.
+
+Run with `python benchmarks/startup.py`.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+
+cases = {
+    "import orch": "import orch",
+    "import orch, load all templates": (
+        "import orch\n"
+        "from orch.flows import flows\n"
+        "from orch.tasks import tasks\n"
+        "flows.load_all()\n"
+        "tasks.load_all()\n"
+    ),
+}
+
+
+def _measure(code: str, number: int) -> list:
+    """Time running the given code in a fresh interpreter, `number` times."""
+    timings = []
+    for _ in range(number):
+        started_at = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True)
+        timings.append(time.perf_counter() - started_at)
+
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=10)
+    args = parser.parse_args()
+
+    baseline = statistics.median(_measure("pass", args.number))
+    print(f"{'interpreter':<32} {baseline * 1000:8.1f}ms")
+
+    for name, code in cases.items():
+        timings = _measure(code, args.number)
+        print(
+            f"{name:<32} {statistics.median(timings) * 1000:8.1f}ms"
+            f"  (+{(statistics.median(timings) - baseline) * 1000:.1f}ms,"
+            f" max {max(timings) * 1000:.1f}ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
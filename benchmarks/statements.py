@@ -0,0 +1,128 @@
+"""Measures the cost of issuing the scheduler's hot queries.
+
+Without a database, the CPU spent per dequeue before the query is sent is
+compared, between building the statement on each call as orch used to and
+reusing the prebuilt one. Either way, SQLAlchemy computes the statement's
+cache key and finds it compiled in its cache.
+
+Given `--database-url`, dequeues are also run against that database, with
+and without asyncpg's prepared statement cache, which spares a round trip to
+prepare the query each time.
+
+Run with `python benchmarks/statements.py`.
+"""
+
+import argparse
+import asyncio
+import time
+import timeit
+from datetime import datetime as dt
+
+import sqlalchemy as sql
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+from sqlalchemy.util import LRUCache
+
+import orch.models.flow as flow
+from orch.models.flow import Flow
+from orch.models.status import Status
+from orch.models.task import Task
+
+dialect = postgresql.asyncpg.dialect()
+
+
+def _build():
+    """Build the dequeue statement as `Flow.get_next_eligible` used to."""
+    flow_blocked = aliased(Flow)
+    task_deferred = aliased(Task)
+
+    q_blocked = (
+        select(flow_blocked.id)
+        .join(Task)
+        .filter(Task.status == Status.BLOCKED)
+        .filter(flow_blocked.id == Flow.id)
+        .exists()
+    )
+    q_deferred = (
+        select(task_deferred.id)
+        .filter(task_deferred.flow_id == Flow.id)
+        .filter(task_deferred.retry_at > dt.utcnow())
+        .exists()
+    )
+    return (
+        select(Flow)
+        .join(Task)
+        .filter(Task.status == Status.PENDING)
+        .filter(Task.retry_at.is_(None))
+        .filter(~q_blocked)
+        .filter(~q_deferred)
+        .with_for_update(skip_locked=True)
+        .order_by(sql.text("priority desc"))
+        .limit(1)
+    )
+
+
+def _issue(statement, cache: LRUCache) -> None:
+    """Do what SQLAlchemy does with a statement, short of sending it."""
+    statement._compile_w_cache(dialect, compiled_cache=cache, column_keys=[])
+
+
+def _cpu(number: int) -> None:
+    cache = LRUCache(500)
+    cases = {
+        "built per call": lambda: _issue(_build(), cache),
+        "prebuilt": lambda: _issue(flow._next_eligible, cache),
+    }
+
+    for name, case in cases.items():
+        case()  # Warm the compiled cache up.
+        timing = min(timeit.repeat(case, number=number, repeat=5)) / number
+        print(f"{name:<32} {timing * 1e6:8.1f}us per dequeue")
+
+
+async def _dequeues(database_url: str, cache_size: int, number: int) -> float:
+    engine = create_async_engine(
+        database_url,
+        connect_args={
+            "prepared_statement_cache_size": cache_size,
+            "statement_cache_size": cache_size,
+        },
+        pool_size=1,
+    )
+    try:
+        async with engine.connect() as conn:
+            params = {"now": dt.utcnow()}
+            await conn.execute(flow._next_eligible, params)
+
+            started_at = time.perf_counter()
+            for _ in range(number):
+                await conn.execute(flow._next_eligible, params)
+                await conn.rollback()
+            return (time.perf_counter() - started_at) / number
+    finally:
+        await engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=2000)
+    parser.add_argument("--database-url", help="an asyncpg database URL")
+    args = parser.parse_args()
+
+    _cpu(args.number)
+
+    if args.database_url:
+        for cache_size in (0, 100):
+            timing = asyncio.run(
+                _dequeues(args.database_url, cache_size, args.number // 10)
+            )
+            print(
+                f"{f'statement cache size {cache_size}':<32}"
+                f" {timing * 1e6:8.1f}us per dequeue"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -23,4 +23,7 @@ setup(
         "uvicorn == 0.24.0",
         "typing_extensions",
     ],
+    extras_require={
+        "orjson": ["orjson == 3.9.10"],
+    },
 )
@@ -2,11 +2,11 @@ import fastapi
 import fastapi.exceptions
 import pydantic as pyd
 import starlette.exceptions
-from fastapi.encoders import jsonable_encoder
 
 import orch.config as conf
 import orch.routes
 import orch.schemas as schemas
+import orch.serialization as serialization
 from orch.flows import flows
 
 app = orch.routes.app
@@ -15,21 +15,20 @@ app = orch.routes.app
 @app.exception_handler(starlette.exceptions.HTTPException)
 async def handle_http_exceptions(_, exc):
     """Converts each HTTP exception to a nice JSON response."""
-    return fastapi.responses.JSONResponse(
-        jsonable_encoder(
-            schemas.ResponseError(status_code=exc.status_code, message=str(exc.detail))
-        ),
+    return serialization.JSONResponse(
+        schemas.ResponseError(
+            status_code=exc.status_code, message=str(exc.detail)
+        ).dict(),
         status_code=exc.status_code,
+        headers=exc.headers,
     )
 
 
 @app.exception_handler(500)
 async def handle_internal_server_error(*_):
     """Converts each internal server error to a nice JSON response."""
-    return fastapi.responses.JSONResponse(
-        jsonable_encoder(
-            schemas.ResponseError(status_code=500, message="internal server error")
-        ),
+    return serialization.JSONResponse(
+        schemas.ResponseError(status_code=500, message="internal server error").dict(),
         status_code=500,
     )
 
@@ -37,12 +36,10 @@ async def handle_internal_server_error(*_):
 @app.exception_handler(pyd.error_wrappers.ValidationError)
 @app.exception_handler(fastapi.exceptions.RequestValidationError)
 async def handle_pydantic_error(_, exc):
-    return fastapi.responses.JSONResponse(
-        jsonable_encoder(
-            schemas.ResponseError(
-                status_code=400, message=str(exc) or "malformed request"
-            )
-        ),
+    return serialization.JSONResponse(
+        schemas.ResponseError(
+            status_code=400, message=str(exc) or "malformed request"
+        ).dict(),
         status_code=400,
     )
 
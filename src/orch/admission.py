@@ -0,0 +1,143 @@
+"""Provides admission control of submitted flows, to bound the backlog.
+
+Submissions are turned away while too many flows are pending, so that the
+queue stays small enough for dequeueing to remain fast. Limits apply to all
+pending flows, as per `admission_max_backlog`, and to those of each name, as
+per the flow's `max_backlog` or else `admission_max_backlog_per_flow`. Zero
+disables a limit. Flows of `admission_exempt_priority` or higher are always
+admitted, as are scheduled and child flows. Flows deferred or scheduled for
+later are not pending until due.
+
+Pending flows are counted every `admission_refresh_period`, rather than upon
+each submission. Flows admitted in between are counted locally meanwhile. On
+Postgres, a single replica counts them each period, claiming to do so as
+schedule occurrences are claimed, and saves the counts into the
+`backlog_counts` table of the primary database, where other replicas load
+them from.
+"""
+
+import datetime as dt
+import math
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+import sqlalchemy as sql
+
+import orch.config as conf
+from orch.database import async_session
+from orch.flows import flows
+from orch.logger import logger
+from orch.models.backends import create
+
+# The key under which replicas claim to count pending flows.
+COUNT_KEY = "admission:backlog"
+
+_clear = sql.text("DELETE FROM backlog_counts")
+
+_save = sql.text(
+    """
+    INSERT INTO backlog_counts (name, count, counted_at)
+    VALUES (:name, :count, now())
+    """
+)
+
+_load = sql.text("SELECT name, count FROM backlog_counts")
+
+# Pending flows by name, as counted last, plus those admitted since.
+_backlog: Counter = Counter()
+
+# When pending flows were last counted, as per `time.monotonic`.
+_counted_at: Optional[float] = None
+
+# Whether any limit applies, found once, upon first use.
+_enabled: Optional[bool] = None
+
+
+def enabled() -> bool:
+    """Tell whether any limit applies, importing only templates setting one."""
+    global _enabled
+
+    if _enabled is None:
+        _enabled = bool(
+            conf.admission_max_backlog
+            or conf.admission_max_backlog_per_flow
+            or any(flows[name].max_backlog for name in flows.declaring("max_backlog"))
+        )
+
+    return _enabled
+
+
+async def _count() -> Dict[str, int]:
+    async with create(read_only=True) as backend:
+        return await backend.backlog()
+
+
+async def _share() -> Dict[str, int]:
+    """Count pending flows if no other replica did this period, else load those."""
+    period = dt.timedelta(milliseconds=conf.admission_refresh_period)
+    async with create() as backend:
+        claimed = await backend.claim_occurrence(
+            COUNT_KEY, period, dt.datetime.utcnow()
+        )
+        await backend.commit()
+
+    if claimed is None:
+        async with async_session() as session:
+            return dict((await session.execute(_load)).all())
+
+    counted = await _count()
+    async with async_session() as session:
+        await session.execute(_clear)
+        if counted:
+            await session.execute(
+                _save, [{"name": name, "count": n} for name, n in counted.items()]
+            )
+        await session.commit()
+
+    return counted
+
+
+async def refresh() -> None:
+    """Count pending flows, by name, or load those counted by another replica."""
+    global _backlog, _counted_at
+
+    try:
+        if conf.storage_backend == "postgres":
+            _backlog = Counter(await _share())
+        else:
+            _backlog = Counter(await _count())
+        _counted_at = time.monotonic()
+    except Exception as err:
+        logger.opt(exception=err).warning("could not count pending flows")
+
+
+def _retry_after() -> int:
+    """Get how many seconds until pending flows are counted again."""
+    period = conf.admission_refresh_period / 1000
+    elapsed = time.monotonic() - (_counted_at or time.monotonic())
+    return max(1, math.ceil(period - elapsed))
+
+
+def admit(name: str, priority: Optional[int]) -> Optional[int]:
+    """Admit a flow about to be submitted, counting it as pending.
+
+    Returns in how many seconds to retry instead, if the flow is turned away.
+    """
+    exempt = conf.admission_exempt_priority
+    if exempt is not None and (priority or 0) >= exempt:
+        _backlog[name] += 1
+        return None
+
+    limit = flows[name].max_backlog or conf.admission_max_backlog_per_flow
+    if limit and _backlog[name] >= limit:
+        return _retry_after()
+
+    if (
+        conf.admission_max_backlog
+        and sum(_backlog.values()) >= conf.admission_max_backlog
+    ):
+        return _retry_after()
+
+    _backlog[name] += 1
+    return None
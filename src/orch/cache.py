@@ -0,0 +1,97 @@
+"""Provides an in-process cache of serialized responses for finished flows.
+
+Flows of status SUCCESS never change again and are cached until evicted.
+Flows of status FAILURE may still be retried, possibly via another process,
+so they are only cached for `flow_cache_failure_ttl` milliseconds.
+"""
+
+import hashlib
+import time
+import uuid
+from typing import NamedTuple, Optional
+
+import cachetools
+
+import orch.config as conf
+from orch.models.status import Status
+
+
+class Entry(NamedTuple):
+    """A flow's serialized response, its ETag and the flow's status."""
+
+    body: bytes
+    etag: str
+    status: Status
+    expires_at: float
+
+
+# Evicts least recently used responses once their total size exceeds the limit.
+_cache = cachetools.LRUCache(
+    maxsize=max(conf.flow_cache_size, 1), getsizeof=lambda e: len(e.body)
+)
+
+
+def _ttl(status: Status) -> Optional[float]:
+    """Return how long a response may be cached for, in seconds, if at all."""
+    if status == Status.SUCCESS:
+        return float("inf")
+    if status == Status.FAILURE:
+        return conf.flow_cache_failure_ttl / 1000
+
+    return None
+
+
+def _entry(status: Status, body: bytes) -> Entry:
+    """Wrap a serialized response into an uncached Entry."""
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    return Entry(body=body, etag=etag, status=status, expires_at=0.0)
+
+
+def get(flow_id: uuid.UUID, resolve_outputs: bool) -> Optional[Entry]:
+    """Get a flow's cached response, if present and fresh."""
+    key = (flow_id, resolve_outputs)
+    found = _cache.get(key)
+    if found is None:
+        return None
+
+    if found.expires_at < time.monotonic():
+        _cache.pop(key, None)
+        return None
+
+    return found
+
+
+def put(
+    flow_id: uuid.UUID, resolve_outputs: bool, status: Status, body: bytes
+) -> Entry:
+    """Cache a flow's serialized response, given the flow's status.
+
+    Returns the Entry, which is only retained if the flow is finished.
+    """
+    found = _entry(status, body)
+    ttl = _ttl(status)
+    if ttl is None or not conf.flow_cache_size or len(body) > conf.flow_cache_size:
+        return found
+
+    found = found._replace(expires_at=time.monotonic() + ttl)
+    _cache[(flow_id, resolve_outputs)] = found
+    return found
+
+
+def invalidate(flow_id: uuid.UUID) -> None:
+    """Drop any cached responses of a flow."""
+    for resolve_outputs in (False, True):
+        _cache.pop((flow_id, resolve_outputs), None)
+
+
+def matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Return whether an `If-None-Match` header matches the given ETag."""
+    if not if_none_match:
+        return False
+
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+
+    return False
@@ -0,0 +1,76 @@
+"""Provides durable checkpoints of Tasks' intermediate state.
+
+Checkpoints live in the `checkpoints` table, apart from the Task, as the Task
+row is locked by the runner for the whole run. Each is saved in a short
+transaction of its own, so that it outlives the run, whatever its outcome.
+A Task rerun, e.g. upon retry, may then restore its state and resume.
+
+The table has no foreign key to `tasks`, as checking it would wait on that
+same lock. Checkpoints are deleted along with their Tasks instead, and are
+stored in their Tasks' shard.
+"""
+
+import uuid
+from typing import Any, Dict, Optional
+
+import sqlalchemy as sql
+import sqlalchemy.dialects.postgresql as psql
+
+import orch.config as conf
+import orch.sharding as sharding
+
+_save = sql.text(
+    """
+    INSERT INTO checkpoints (task_id, state, updated_at)
+    VALUES (:task_id, :state, now())
+    ON CONFLICT (task_id) DO UPDATE SET
+        state = excluded.state,
+        updated_at = excluded.updated_at
+    """
+).bindparams(sql.bindparam("state", type_=psql.JSONB))
+
+_load = sql.text("SELECT state FROM checkpoints WHERE task_id = :task_id")
+
+_clear = sql.text("DELETE FROM checkpoints WHERE task_id = :task_id")
+
+# The table, to delete checkpoints of deleted Tasks in bulk.
+table = sql.table("checkpoints", sql.column("task_id"))
+
+# Checkpoints kept in process memory, by Task id.
+_local: Dict[uuid.UUID, Dict[str, Any]] = {}
+
+
+async def save(task_id: uuid.UUID, state: Dict[str, Any]) -> None:
+    """Durably save a Task's state, replacing any previous checkpoint."""
+    if conf.storage_backend != "postgres":
+        _local[task_id] = state
+        return
+
+    async with sharding.session(task_id) as session:
+        await session.execute(_save, {"task_id": task_id, "state": state})
+        await session.commit()
+
+
+async def load(task_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+    """Load a Task's last checkpointed state, if any."""
+    if conf.storage_backend != "postgres":
+        return _local.get(task_id)
+
+    async with sharding.session(task_id) as session:
+        return (await session.execute(_load, {"task_id": task_id})).scalar()
+
+
+async def clear(task_id: uuid.UUID) -> None:
+    """Drop a Task's checkpoint, once no longer needed."""
+    if conf.storage_backend != "postgres":
+        _local.pop(task_id, None)
+        return
+
+    async with sharding.session(task_id) as session:
+        await session.execute(_clear, {"task_id": task_id})
+        await session.commit()
+
+
+def forget(task_id: uuid.UUID) -> None:
+    """Drop a checkpoint kept in process memory, upon deleting its Task."""
+    _local.pop(task_id, None)
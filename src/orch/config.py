@@ -3,7 +3,8 @@
 import dataclasses
 import os
 import re
-from typing import Any, Callable
+import tempfile
+from typing import Any, Callable, FrozenSet, Tuple
 
 from dotenv import load_dotenv
 
@@ -44,6 +45,20 @@ class Conf:
         return self.default
 
 
+def _into_set(val: str) -> FrozenSet[str]:
+    """Parse a comma separated list of values."""
+    return frozenset(item.strip() for item in val.split(",") if item.strip())
+
+
+def _into_list(val: str) -> Tuple[str, ...]:
+    """Parse a comma separated list of values, keeping their order."""
+    return tuple(item.strip() for item in val.split(",") if item.strip())
+
+
+def _into_bool(val: str) -> bool:
+    return val.lower() in ("1", "true", "yes", "on")
+
+
 def need(conf: Conf) -> None:
     """Declare a strong yet gentle need that a config value be exposed.
 
@@ -78,11 +93,45 @@ need(Conf("application", default="orch"))
 need(Conf("log_level", default="INFO"))
 need(Conf("async_database_url", required=True))
 need(Conf("database_url", required=True))
+need(Conf("async_read_database_url", default=None))
+need(Conf("database_statement_cache_size", into=int, default=100))
+need(Conf("async_shard_database_urls", into=_into_list, default=()))
+need(Conf("runner_shards", into=_into_set, default=frozenset()))
+need(Conf("read_pool_size", into=int, default=10))
+need(Conf("read_max_staleness", into=int, default=5000))
+need(Conf("read_lag_check_period", into=int, default=1000))
 need(Conf("tick_period", into=int, default=1000))
 need(Conf("webhook_num_of_retries", into=int, default=3))
 need(Conf("webhook_timeout", into=int, default=5000))
 need(Conf("webhook_pause_between_retries", into=int, default=100))
 need(Conf("orch_url", required=True))
+need(Conf("storage_backend", default="postgres"))
+need(Conf("output_offload_threshold", into=int, default=1024 * 1024))
+need(Conf("flow_cache_size", into=int, default=64 * 1024 * 1024))
+need(Conf("flow_cache_failure_ttl", into=int, default=5000))
+need(Conf("flow_wait_max_timeout", into=int, default=60000))
+need(Conf("flow_events_keepalive", into=int, default=15000))
+need(Conf("hooks_batch_max_size", into=int, default=1000))
+need(Conf("bulk_chunk_size", into=int, default=1000))
+need(Conf("admission_max_backlog", into=int, default=0))
+need(Conf("admission_max_backlog_per_flow", into=int, default=0))
+need(Conf("admission_exempt_priority", into=int, default=None))
+need(Conf("admission_refresh_period", into=int, default=5000))
+need(Conf("progress_min_interval", into=int, default=1000))
+need(Conf("scheduling_policy", default="priority"))
+need(Conf("duration_stats_flush_period", into=int, default=10000))
+need(Conf("schedule_period", into=int, default=10000))
+need(Conf("profile_tasks", into=_into_set, default=frozenset()))
+need(Conf("profile_sample_rate", into=float, default=0.01))
+need(Conf("profile_dir", default=os.path.join(tempfile.gettempdir(), "orch")))
+need(Conf("profile_max_count", into=int, default=20))
+need(Conf("trace_exporter", default=""))
+need(Conf("trace_file", default=os.path.join(tempfile.gettempdir(), "orch.traces")))
+need(Conf("trace_memory_size", into=int, default=1000))
+need(Conf("trace_file_batch_size", into=int, default=512))
+need(Conf("loop_lag_interval", into=int, default=100))
+need(Conf("loop_stall_threshold", into=int, default=500))
+need(Conf("loop_debug", into=_into_bool, default=False))
 
 load_dotenv()
 expose()
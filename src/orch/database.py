@@ -1,8 +1,5 @@
 """Provides a database connection and its base model."""
 
-import datetime
-import json
-
 import sqlalchemy as sql
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
@@ -10,33 +7,59 @@ from sqlalchemy.orm import sessionmaker
 
 import alembic
 import orch.config as conf
+import orch.serialization as serialization
+
+# How many prepared statements asyncpg caches per connection, sparing a round
+# trip to prepare each query. Behind pgbouncer in transaction pooling mode,
+# set `database_statement_cache_size` to 0, as connections are shared.
+statement_cache_args = {
+    "prepared_statement_cache_size": conf.database_statement_cache_size,
+    "statement_cache_size": conf.database_statement_cache_size,
+}
+
+
+def _create_engine(url: str, pool_size: int):
+    return create_async_engine(
+        url,
+        json_serializer=serialization.dumps,
+        json_deserializer=serialization.loads,
+        future=True,
+        pool_size=pool_size,
+        max_overflow=pool_size,
+        pool_timeout=120,
+        connect_args=statement_cache_args,
+    )
 
 
-def _custom_json_encode(val):
-    """Serializes values to JSON."""
+engine = _create_engine(conf.async_database_url, 30)
 
-    def _default(unknown):
-        if isinstance(unknown, datetime.datetime):
-            return unknown.isoformat()
-        raise TypeError(f"could not encode {unknown} to json")
 
-    return json.dumps(val, default=_default)
+Base = declarative_base()
 
 
-engine = create_async_engine(
-    conf.async_database_url,
-    json_serializer=_custom_json_encode,
-    future=True,
-    pool_size=30,
-    max_overflow=30,
-    pool_timeout=120,
-)
+async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# An engine for a read-only replica, if configured, to serve reads off the
+# primary. Its pool is sized apart, as the runner never uses it.
+read_engine = (
+    _create_engine(conf.async_read_database_url, conf.read_pool_size)
+    if conf.async_read_database_url
+    else None
+)
 
-Base = declarative_base()
+async_read_session = (
+    sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+    if read_engine is not None
+    else None
+)
 
 
-async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+# Sessions of each database Flows are spread across, the primary one first.
+# See `orch.sharding`.
+async_shard_sessions = [async_session] + [
+    sessionmaker(_create_engine(url, 30), class_=AsyncSession, expire_on_commit=False)
+    for url in conf.async_shard_database_urls
+]
 
 
 async def get_session() -> AsyncSession:
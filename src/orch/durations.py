@@ -0,0 +1,283 @@
+"""Provides duration statistics of Tasks and Flows, by name.
+
+Runners record how long successful Tasks ran, and how long Flows ran in all
+once successful, into quantile sketches. A sketch counts durations within
+logarithmic buckets, so that any quantile is known within `ACCURACY` of its
+value, in bounded space. Sketches recorded by each runner are merged into the
+`duration_stats` table of the primary database every
+`duration_stats_flush_period`, and those merged by all replicas are loaded
+back. They are copied to the table of every other shard as well, where the
+dequeue statement reads medians from.
+
+Median durations predict when pending Flows finish, and, as per
+`scheduling_policy`, let runners prefer Flows expected to be short among
+those of the same priority. Flows never seen to succeed yet come first, so
+as to be measured.
+"""
+
+import math
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+import sqlalchemy as sql
+import sqlalchemy.dialects.postgresql as psql
+
+import orch.config as conf
+from orch.database import async_session, async_shard_sessions
+from orch.logger import logger
+from orch.models.status import Status
+
+# How Flows of the same priority are ordered, oldest first or shortest first,
+# then oldest first.
+POLICIES = ("priority", "shortest_expected")
+
+assert (
+    conf.scheduling_policy in POLICIES
+), f"scheduling policy must be one of {', '.join(POLICIES)}"
+
+# Kinds of durations recorded.
+TASK = "task"
+FLOW = "flow"
+
+# The relative accuracy of quantiles.
+ACCURACY = 0.02
+
+# The ratio between the bounds of each bucket.
+_GAMMA = (1 + ACCURACY) / (1 - ACCURACY)
+
+# The shortest duration told apart, in seconds. Shorter ones count as such.
+_SHORTEST = 0.001
+
+# The statistics table, as referred to by the dequeue statement.
+stats = sql.table(
+    "duration_stats",
+    sql.column("kind"),
+    sql.column("name"),
+    sql.column("median"),
+)
+
+_create = sql.text(
+    """
+    INSERT INTO duration_stats (kind, name, count, total, buckets, updated_at)
+    VALUES (:kind, :name, 0, 0, '{}', now())
+    ON CONFLICT (kind, name) DO NOTHING
+    """
+)
+
+_lock = sql.text(
+    """
+    SELECT count, total, buckets FROM duration_stats
+    WHERE kind = :kind AND name = :name
+    FOR UPDATE
+    """
+).columns(buckets=psql.JSONB)
+
+_save = sql.text(
+    """
+    UPDATE duration_stats SET
+        count = :count,
+        total = :total,
+        median = :median,
+        buckets = :buckets,
+        updated_at = now()
+    WHERE kind = :kind AND name = :name
+    """
+).bindparams(sql.bindparam("buckets", type_=psql.JSONB))
+
+_copy = sql.text(
+    """
+    INSERT INTO duration_stats AS s
+        (kind, name, count, total, median, buckets, updated_at)
+    VALUES (:kind, :name, :count, :total, :median, :buckets, now())
+    ON CONFLICT (kind, name) DO UPDATE SET
+        count = excluded.count,
+        total = excluded.total,
+        median = excluded.median,
+        buckets = excluded.buckets,
+        updated_at = excluded.updated_at
+    WHERE s.count < excluded.count
+    """
+).bindparams(sql.bindparam("buckets", type_=psql.JSONB))
+
+_load = sql.text(
+    "SELECT kind, name, count, total, buckets FROM duration_stats"
+).columns(buckets=psql.JSONB)
+
+
+class Sketch:
+    """Counts durations within buckets, for quantiles to be estimated."""
+
+    def __init__(
+        self,
+        buckets: Optional[Dict[int, int]] = None,
+        count: int = 0,
+        total: float = 0.0,
+    ):
+        # How many durations fell within each bucket, by bucket index.
+        self.buckets: Dict[int, int] = buckets or {}
+
+        # How many durations were recorded, and their sum, in seconds.
+        self.count = count
+        self.total = total
+
+    def add(self, seconds: float) -> None:
+        index = math.ceil(math.log(max(seconds, _SHORTEST), _GAMMA))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+
+    def merge(self, other: "Sketch") -> None:
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile of the durations, in seconds, if any."""
+        if not self.count:
+            return None
+
+        rank = q * (self.count - 1)
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                break
+
+        return 2 * _GAMMA**index / (_GAMMA + 1)
+
+    def to_json(self) -> Dict[str, int]:
+        return {str(index): count for index, count in self.buckets.items()}
+
+    @staticmethod
+    def from_json(buckets: Dict[str, int], count: int, total: float) -> "Sketch":
+        return Sketch({int(index): n for index, n in buckets.items()}, count, total)
+
+
+# Statistics known to this process, by kind and name.
+_known: Dict[Tuple[str, str], Sketch] = defaultdict(Sketch)
+
+# Durations recorded since statistics were last flushed, by kind and name.
+_recorded: Dict[Tuple[str, str], Sketch] = defaultdict(Sketch)
+
+# Median durations estimated from known statistics, by kind and name.
+_medians: Dict[Tuple[str, str], Optional[float]] = {}
+
+
+def _record(kind: str, name: str, seconds: float) -> None:
+    _known[(kind, name)].add(seconds)
+    _medians.pop((kind, name), None)
+    if conf.storage_backend == "postgres":
+        _recorded[(kind, name)].add(seconds)
+
+
+def observe(flow, before: Dict) -> None:
+    """Record the durations of a Flow's Tasks which just succeeded.
+
+    So is the Flow's, if it just succeeded, as the sum of its Tasks' run
+    times, leaving out time spent queued or blocked. `before` are the
+    statuses of the Tasks before being run, by Task id.
+    """
+    succeeded = False
+    for task in flow.tasks:
+        if task.status == Status.SUCCESS and before.get(task.id) != Status.SUCCESS:
+            _record(TASK, task.name, task.duration())
+            succeeded = True
+
+    if succeeded and flow.status() == Status.SUCCESS:
+        _record(FLOW, flow.name, flow.duration(only_tasks=True))
+
+
+def expected(kind: str, name: str) -> Optional[float]:
+    """Get the median duration of Tasks or Flows of a name, if ever seen."""
+    key = (kind, name)
+    if key not in _medians:
+        found = _known.get(key)
+        _medians[key] = found.quantile(0.5) if found is not None else None
+
+    return _medians[key]
+
+
+async def _merge(recorded: Dict[Tuple[str, str], Sketch]) -> Dict:
+    """Merge recorded statistics into the database, and load all of them."""
+    async with async_session() as session:
+        # Lock rows in the same order in all replicas, lest they deadlock.
+        for kind, name in sorted(recorded):
+            params = {"kind": kind, "name": name}
+            await session.execute(_create, params)
+            count, total, buckets = (await session.execute(_lock, params)).one()
+
+            merged = Sketch.from_json(buckets, count, total)
+            merged.merge(recorded[(kind, name)])
+            await session.execute(
+                _save,
+                {
+                    **params,
+                    "count": merged.count,
+                    "total": merged.total,
+                    "median": merged.quantile(0.5),
+                    "buckets": merged.to_json(),
+                },
+            )
+
+        rows = (await session.execute(_load)).all()
+        await session.commit()
+
+    return {
+        (kind, name): Sketch.from_json(buckets, count, total)
+        for kind, name, count, total, buckets in rows
+    }
+
+
+async def _copy_to_shards(loaded: Dict[Tuple[str, str], Sketch]) -> None:
+    """Copy statistics to the shards other than the primary.
+
+    Only statistics of more durations than those already copied are, lest
+    replicas copying concurrently roll them back.
+    """
+    rows = [
+        {
+            "kind": kind,
+            "name": name,
+            "count": sketch.count,
+            "total": sketch.total,
+            "median": sketch.quantile(0.5),
+            "buckets": sketch.to_json(),
+        }
+        for (kind, name), sketch in sorted(loaded.items())
+    ]
+    if not rows:
+        return
+
+    for shard_session in async_shard_sessions[1:]:
+        async with shard_session() as session:
+            await session.execute(_copy, rows)
+            await session.commit()
+
+
+async def flush() -> None:
+    """Merge the statistics recorded here with those of other replicas."""
+    global _known, _recorded
+
+    if conf.storage_backend != "postgres":
+        return
+
+    recorded, _recorded = _recorded, defaultdict(Sketch)
+    try:
+        loaded = await _merge(recorded)
+    except Exception as err:
+        logger.opt(exception=err).warning("could not flush duration statistics")
+        for key, sketch in recorded.items():
+            _recorded[key].merge(sketch)
+        return
+
+    try:
+        await _copy_to_shards(loaded)
+    except Exception as err:
+        logger.opt(exception=err).warning("could not copy duration statistics")
+
+    # Keep durations recorded meanwhile, until flushed next.
+    _known = defaultdict(Sketch, loaded)
+    for key, sketch in _recorded.items():
+        _known[key].merge(sketch)
+    _medians.clear()
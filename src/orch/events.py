@@ -0,0 +1,220 @@
+"""Provides notifications of flow and task status transitions.
+
+Transitions are sent with `pg_notify` inside the transaction that makes them,
+so that every replica listening on the channel learns about them on commit.
+The process that made them also publishes them to its own subscribers right
+away, and ignores them once they come back through the channel. Progress
+reported by running tasks is sent the same way, see `orch.progress`.
+"""
+
+import asyncio
+import contextlib
+import uuid
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+import asyncpg
+
+import orch.cache as cache
+import orch.config as conf
+import orch.serialization as serialization
+from orch.logger import logger
+from orch.models.backends import Backend, BulkChunk, UnblockedTask
+from orch.models.flow import Flow
+from orch.models.status import Status
+
+# Statuses after which a flow makes no further progress on its own.
+TERMINAL = (Status.SUCCESS, Status.FAILURE)
+
+# Postgres channel all transitions are sent on.
+CHANNEL = "orch_flow_events"
+
+# Distinguishes transitions made by this process from those of other replicas.
+_origin = uuid.uuid4().hex
+
+# Queues of local subscribers, by flow id.
+_subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+_listener: Optional[asyncio.Task] = None
+
+
+def _event(
+    flow_id: uuid.UUID,
+    flow_status: Status,
+    task_id: uuid.UUID,
+    task_name: str,
+    ordering: int,
+    status: Status,
+) -> Dict[str, Any]:
+    """Describe a single Task's transition."""
+    return {
+        "flow_id": str(flow_id),
+        "flow_status": flow_status.value,
+        "task_id": str(task_id),
+        "task_name": task_name,
+        "ordering": ordering,
+        "status": status.value,
+    }
+
+
+def transitions(flow: Flow, before: Dict[uuid.UUID, Status]) -> List[Dict[str, Any]]:
+    """Describe Tasks whose status differs from the given earlier statuses."""
+    flow_status = flow.status()
+    return [
+        _event(flow.id, flow_status, task.id, task.name, task.ordering, task.status)
+        for task in flow.tasks
+        if before.get(task.id) != task.status
+    ]
+
+
+def dumps(event: Dict[str, Any]) -> str:
+    """Serialize an event to be sent to other replicas on `CHANNEL`."""
+    return serialization.dumps({**event, "origin": _origin})
+
+
+async def _send(backend: Backend, events: List[Dict[str, Any]]) -> None:
+    """Send transitions to other replicas, once the work commits."""
+    if events:
+        await backend.notify(CHANNEL, [dumps(event) for event in events])
+
+
+async def notify(
+    backend: Backend, flow: Flow, before: Dict[uuid.UUID, Status]
+) -> List[Dict[str, Any]]:
+    """Send a Flow's transitions to other replicas, once the work commits.
+
+    Returns the transitions, to be passed to `publish` after committing.
+    """
+    events = transitions(flow, before)
+    await _send(backend, events)
+    return events
+
+
+async def notify_unblocked(
+    backend: Backend, tasks: List[UnblockedTask]
+) -> List[Dict[str, Any]]:
+    """Send transitions of Tasks unblocked by correlation key.
+
+    Their Flows are not loaded, and are assumed to be pending as a result.
+    Returns the transitions, to be passed to `publish` after committing.
+    """
+    events = [
+        _event(
+            task.flow_id,
+            Status.PENDING,
+            task.task_id,
+            task.name,
+            task.ordering,
+            Status.PENDING,
+        )
+        for task in tasks
+    ]
+    await _send(backend, events)
+    return events
+
+
+async def notify_bulk(backend: Backend, chunk: BulkChunk) -> List[Dict[str, Any]]:
+    """Send the resulting statuses of Flows affected by a bulk operation.
+
+    As Tasks are not loaded, these carry no Task details.
+    Returns the transitions, to be passed to `publish` after committing.
+    """
+    events = [
+        {"flow_id": str(flow_id), "flow_status": status.value}
+        for flow_id, status in chunk.flows.items()
+    ]
+    await _send(backend, events)
+    return events
+
+
+def publish(events: List[Dict[str, Any]]) -> None:
+    """Hand transitions to the local subscribers of their flows.
+
+    Also drops any responses of those flows cached by this process.
+    """
+    for event in events:
+        cache.invalidate(uuid.UUID(event["flow_id"]))
+        for queue in _subscribers.get(event["flow_id"], ()):
+            queue.put_nowait(event)
+
+
+@contextlib.asynccontextmanager
+async def subscribe(flow_id: uuid.UUID) -> AsyncIterator[asyncio.Queue]:
+    """Receive a flow's transitions on a queue while in context."""
+    key = str(flow_id)
+    queue = asyncio.Queue()
+    _subscribers[key].add(queue)
+    try:
+        yield queue
+    finally:
+        _subscribers[key].discard(queue)
+        if not _subscribers[key]:
+            del _subscribers[key]
+
+
+async def wait(queue: asyncio.Queue, timeout: float) -> bool:
+    """Wait for a subscribed flow to finish, for at most `timeout` seconds.
+
+    Returns whether any of the flow's transitions were received.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    received = False
+
+    while True:
+        try:
+            event = await asyncio.wait_for(queue.get(), deadline - loop.time())
+        except asyncio.TimeoutError:
+            return received
+
+        received = True
+        if Status(event["flow_status"]) in TERMINAL:
+            return True
+
+
+def _on_notification(_conn, _pid, _channel, payload: str) -> None:
+    """Publish transitions made by other replicas."""
+    event = serialization.loads(payload)
+    if event.pop("origin", None) != _origin:
+        publish([event])
+
+
+async def _listen() -> None:
+    """Listen for transitions of other replicas, reconnecting upon errors."""
+    dsn = conf.async_database_url.replace("+asyncpg", "")
+    while True:
+        try:
+            conn = await asyncpg.connect(dsn)
+            closed = asyncio.get_running_loop().create_future()
+            conn.add_termination_listener(lambda _: closed.set_result(None))
+            await conn.add_listener(CHANNEL, _on_notification)
+            logger.info("listening for flow events")
+            try:
+                await closed
+            finally:
+                await conn.close()
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as err:
+            logger.opt(exception=err).warning("flow event listener error")
+
+        await asyncio.sleep(conf.tick_period / 1000)
+
+
+def start() -> None:
+    """Start listening for transitions of other replicas."""
+    global _listener
+    if _listener is None:
+        _listener = asyncio.create_task(_listen())
+
+
+async def stop() -> None:
+    """Stop listening for transitions of other replicas."""
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _listener
+        _listener = None
@@ -5,3 +5,11 @@ class OrchException(Exception):
     def __init__(self, message: str):
         self.message = message
         super().__init__(self.message)
+
+
+class BlobNotFound(OrchException):
+    """A Task output refers to a Blob no longer stored."""
+
+    def __init__(self, digest: str):
+        self.digest = digest
+        super().__init__(f"no such blob: {digest}")
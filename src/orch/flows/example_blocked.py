@@ -1,8 +1,9 @@
 """An example flow that blocks on its (only) task. It can be unblocked only
-with an external calls via webhook.
+with an external calls via webhook, addressed either by the flow's id or by
+the given correlation key.
 """
 
-from typing import List
+from typing import List, Optional
 
 import orch.tasks.example_blocked as example_task
 from orch.flows.template import FlowTemplate
@@ -10,5 +11,8 @@ from orch.tasks.template import TaskTemplate
 
 
 class Flow(FlowTemplate):
+    # correlation_key: a key by which the flow can be unblocked
+    correlation_key: Optional[str] = None
+
     def tasks(self) -> List[TaskTemplate]:
-        return [example_task.Task()]
+        return [example_task.Task(correlation_key=self.correlation_key)]
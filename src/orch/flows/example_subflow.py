@@ -0,0 +1,23 @@
+"""An example flow that runs the example flow as a child, then waits again"""
+
+from typing import List
+
+import pydantic as pyd
+
+import orch.tasks.example as example_task
+import orch.tasks.subflow as subflow_task
+from orch.flows.template import FlowTemplate
+from orch.tasks.template import TaskTemplate
+
+
+class Flow(FlowTemplate):
+    # wait_time: how long the child flow, then the flow itself will wait
+    wait_time: pyd.conint(strict=True, ge=0, le=60 * 60 * 1000)
+
+    def tasks(self) -> List[TaskTemplate]:
+        return [
+            subflow_task.Task(
+                flow_name="example", flow_args={"wait_time": self.wait_time}
+            ),
+            example_task.Task(wait_time=self.wait_time),
+        ]
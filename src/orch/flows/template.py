@@ -1,9 +1,10 @@
 """Provides a Flow template that other Flows inherit."""
 
-from typing import Any, Dict, List, Optional
+from typing import Any, ClassVar, Dict, List, Optional
 
 import pydantic as pyd
 
+from orch.schedules import Schedule
 from orch.tasks.template import TaskTemplate
 
 
@@ -12,6 +13,17 @@ class FlowTemplate(pyd.BaseModel):
 
     extra: Optional[Dict[str, Any]] = None
 
+    # Schedules on which the Flow is submitted, with their own arguments.
+    # Keys identify schedules across all replicas and must be unique. They
+    # are set in the template's own class, where they are found without
+    # importing other templates, see `Registry.declaring`.
+    schedules: ClassVar[List[Schedule]] = []
+
+    # How many Flows of this name may be pending before submissions are
+    # turned away, if not `admission_max_backlog_per_flow`. See `orch.admission`.
+    # Set in the template's own class, as schedules are.
+    max_backlog: ClassVar[Optional[int]] = None
+
     class Config:
         extra = "forbid"
 
@@ -1,6 +1,5 @@
 """Provides a global JSON logger to stderr."""
 
-import json
 import logging
 import sys
 import traceback
@@ -8,6 +7,7 @@ import traceback
 from loguru import logger
 
 import orch.config as conf
+import orch.serialization as serialization
 
 
 def _stderr_json_sink(msg: dict) -> None:
@@ -36,7 +36,7 @@ def _stderr_json_sink(msg: dict) -> None:
         out["error"] = f"{type(exc).__name__}: {exc}"
         out["error_stacktrace"] = traceback.format_exc()
 
-    sys.stderr.write(json.dumps(out, ensure_ascii=False, separators=(",", ":")))
+    sys.stderr.write(serialization.dumps(out))
     sys.stderr.write("\n")
     sys.stderr.flush()
 
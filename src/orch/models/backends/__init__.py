@@ -0,0 +1,56 @@
+"""Provides storage backends for Flows, selected via `storage_backend`."""
+
+from typing import AsyncIterator
+
+import orch.config as conf
+import orch.replica as replica
+import orch.sharding as sharding
+from orch.database import async_read_session, async_shard_sessions
+from orch.models.backends import memory
+from orch.models.backends.base import Backend, BulkChunk, FlowFilter, UnblockedTask
+from orch.models.backends.memory import MemoryBackend, MemoryStore
+from orch.models.backends.postgres import PostgresBackend
+from orch.models.backends.sharded import ShardedBackend
+
+backends = {
+    "postgres": PostgresBackend,
+    "memory": MemoryBackend,
+}
+
+assert conf.storage_backend in backends, f"no such backend {conf.storage_backend}"
+
+# Stores of each shard, when sharding the memory backend.
+_memory_stores = [memory.store] + [MemoryStore() for _ in range(sharding.count - 1)]
+
+
+def _create_shard(shard: int) -> Backend:
+    if conf.storage_backend == "memory":
+        return MemoryBackend(_memory_stores[shard])
+
+    return PostgresBackend(async_shard_sessions[shard]())
+
+
+def create(read_only: bool = False) -> Backend:
+    """Create a unit of work with the configured storage backend.
+
+    A read only one is served by the read replica, if configured and not
+    lagging too far behind. The replica is not used when Flows are sharded.
+    """
+    if sharding.count > 1:
+        shards = [_create_shard(shard) for shard in range(sharding.count)]
+        return ShardedBackend(shards, sharding.assigned)
+
+    if read_only and conf.storage_backend == "postgres" and replica.usable():
+        return PostgresBackend(async_read_session())
+
+    return backends[conf.storage_backend]()
+
+
+async def get_backend() -> AsyncIterator[Backend]:
+    async with create() as backend:
+        yield backend
+
+
+async def get_read_backend() -> AsyncIterator[Backend]:
+    async with create(read_only=True) as backend:
+        yield backend
@@ -0,0 +1,229 @@
+"""Provides the interface every storage backend implements."""
+
+import abc
+import dataclasses
+import datetime
+import uuid
+from typing import Any, Dict, Hashable, Iterable, List, NamedTuple, Optional
+
+import sqlalchemy as sql
+from sqlalchemy.future import select
+
+from orch.models.flow import Flow
+from orch.models.status import Status
+from orch.models.task import Task
+
+
+def flow_status():
+    """Return an SQL expression of a Flow's status, matching `Flow.status`.
+
+    That is the status of the Flow's first Task that did not succeed, if any.
+    """
+    first_unsuccessful = (
+        select(Task.status)
+        .filter(Task.flow_id == Flow.id)
+        .filter(Task.status != Status.SUCCESS)
+        .order_by(Task.ordering)
+        .limit(1)
+        .scalar_subquery()
+    )
+    return sql.func.coalesce(first_unsuccessful, Status.SUCCESS)
+
+
+@dataclasses.dataclass
+class FlowFilter:
+    """Criteria that listed Flows must match."""
+
+    name: Optional[str] = None
+    ids: Optional[List[uuid.UUID]] = None
+    created_from: Optional[datetime.datetime] = None
+    created_to: Optional[datetime.datetime] = None
+    priority: Optional[int] = None
+    status: Optional[Status] = None
+    parent_id: Optional[uuid.UUID] = None
+
+    def __bool__(self) -> bool:
+        return any(
+            val is not None and val != [] for val in dataclasses.asdict(self).values()
+        )
+
+    def apply(self, query):
+        """Return the given Flow query, filtered by the criteria."""
+        if self.name:
+            query = query.filter(Flow.name == self.name)
+
+        if self.ids:
+            query = query.filter(Flow.id.in_(self.ids))
+
+        if self.created_from:
+            query = query.filter(Flow.created_at >= self.created_from)
+
+        if self.created_to:
+            query = query.filter(Flow.created_at <= self.created_to)
+
+        if self.priority is not None:
+            query = query.filter(Flow.priority == self.priority)
+
+        if self.status is not None:
+            query = query.filter(flow_status() == self.status)
+
+        if self.parent_id is not None:
+            query = query.filter(Flow.parent_id == self.parent_id)
+
+        return query
+
+    def matches(self, flow: Flow) -> bool:
+        """Return whether a Flow matches the criteria."""
+        return (
+            (not self.name or flow.name == self.name)
+            and (not self.ids or flow.id in self.ids)
+            and (not self.created_from or flow.created_at >= self.created_from)
+            and (not self.created_to or flow.created_at <= self.created_to)
+            and (self.priority is None or flow.priority == self.priority)
+            and (self.status is None or flow.status() == self.status)
+            and (self.parent_id is None or flow.parent_id == self.parent_id)
+        )
+
+
+class UnblockedTask(NamedTuple):
+    """A Task unblocked by its correlation key."""
+
+    flow_id: uuid.UUID
+    task_id: uuid.UUID
+    name: str
+    ordering: int
+    correlation_key: str
+
+
+class BulkChunk(NamedTuple):
+    """Flows affected by a chunk of a bulk operation."""
+
+    # Ids and resulting statuses of the affected Flows.
+    flows: Dict[uuid.UUID, Status]
+
+    # How many Tasks were affected.
+    tasks: int
+
+    # Names of the child Flows cancelled, by id, whose parents wait on them.
+    children: Dict[uuid.UUID, str]
+
+
+class Backend(abc.ABC):
+    """A unit of work over stored Flows, akin to a database session.
+
+    Flows obtained through a Backend may be modified in place. Their
+    modifications, as well as inserted Flows, are persisted upon `commit`.
+    A Backend may be used again after it has been closed.
+    """
+
+    async def __aenter__(self) -> "Backend":
+        return self
+
+    async def __aexit__(self, *_) -> None:
+        await self.close()
+
+    @abc.abstractmethod
+    async def claim(self) -> Optional[Flow]:
+        """Claim the next Flow eligible to be run, if any.
+
+        A claimed Flow is not handed out to anyone else until the unit of
+        work commits or closes. Flows of higher priority are claimed first.
+        """
+
+    @abc.abstractmethod
+    async def wake(self) -> int:
+        """Make deferred Tasks due by now eligible to be run again.
+
+        Returns how many Tasks were woken up.
+        """
+
+    @abc.abstractmethod
+    async def claim_occurrence(
+        self, key: str, period: datetime.timedelta, horizon: datetime.datetime
+    ) -> Optional[datetime.datetime]:
+        """Claim the next occurrence of a schedule, if due before `horizon`.
+
+        Each occurrence is claimed once across all units of work, once this
+        one commits. Occurrences missed altogether are skipped.
+        """
+
+    @abc.abstractmethod
+    async def get(self, flow_id: uuid.UUID, lock: bool = False) -> Optional[Flow]:
+        """Get a Flow by its unique id."""
+
+    @abc.abstractmethod
+    async def list(
+        self, filters: FlowFilter, limit: Optional[int] = None
+    ) -> List[Flow]:
+        """List Flows matching the given criteria, most recent first."""
+
+    @abc.abstractmethod
+    async def backlog(self) -> Dict[str, int]:
+        """Count Flows having pending Tasks, by name.
+
+        Tasks deferred or scheduled for later do not count until due.
+        """
+
+    @abc.abstractmethod
+    async def insert(self, flows: Iterable[Flow]) -> None:
+        """Insert new Flows, along with their Tasks."""
+
+    @abc.abstractmethod
+    async def unblock(self, bodies: Dict[str, Dict[str, Any]]) -> List[UnblockedTask]:
+        """Unblock all blocked Tasks registered under the given correlation keys.
+
+        Each Task is handed the body given for its key, as its
+        `webhook_request_body` argument. This is done without loading Flows.
+        """
+
+    @abc.abstractmethod
+    async def retry_chunk(
+        self, filters: FlowFilter, size: int, until: datetime.datetime
+    ) -> BulkChunk:
+        """Set failed Tasks of up to `size` matching Flows pending again.
+
+        Only Tasks that failed by `until` are, so that Tasks failing again
+        while the operation goes on are not retried over and over. Flows
+        being run are skipped. Nothing is loaded into memory.
+        """
+
+    @abc.abstractmethod
+    async def cancel_chunk(
+        self, filters: FlowFilter, size: int, until: datetime.datetime
+    ) -> BulkChunk:
+        """Fail pending and blocked Tasks of up to `size` matching Flows.
+
+        Only Flows created by `until` are cancelled. Flows being run are
+        skipped. Nothing is loaded into memory. Cancelled child Flows are
+        returned, for their parents to be released.
+        """
+
+    @abc.abstractmethod
+    async def purge_chunk(
+        self, filters: FlowFilter, size: int, until: datetime.datetime
+    ) -> BulkChunk:
+        """Delete up to `size` matching finished Flows, along with their Tasks.
+
+        Only Flows created by `until` are deleted. Nothing is loaded into
+        memory. The affected Flows' statuses are given as they were before
+        deletion. Offloaded outputs no remaining Task refers to are deleted
+        too.
+        """
+
+    @abc.abstractmethod
+    async def resolve_outputs(
+        self, values: Dict[Hashable, Optional[Dict[str, Any]]]
+    ) -> Dict[Hashable, Optional[Dict[str, Any]]]:
+        """Replace references to offloaded Task outputs with their data."""
+
+    @abc.abstractmethod
+    async def notify(self, channel: str, payloads: List[str]) -> None:
+        """Send notifications to other replicas, once the work commits."""
+
+    @abc.abstractmethod
+    async def commit(self) -> None:
+        """Persist all work done so far and release any claims."""
+
+    @abc.abstractmethod
+    async def close(self) -> None:
+        """Release any claims and resources, discarding uncommitted work."""
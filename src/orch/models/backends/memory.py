@@ -0,0 +1,330 @@
+"""Provides a storage backend keeping Flows in process memory.
+
+It is meant for benchmarking and profiling the scheduler and the API without
+a database. Nothing is durable, and uncommitted modifications of Flows are
+visible to every unit of work right away, as Flows are modified in place.
+"""
+
+import copy
+import datetime
+import heapq
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime as dt
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+import orch.config as conf
+import orch.durations as durations
+from orch import checkpoints
+from orch.models.backends.base import Backend, BulkChunk, FlowFilter, UnblockedTask
+from orch.models.flow import Flow
+from orch.models.status import Status
+
+
+def _apply_defaults(obj) -> None:
+    """Fill in the column defaults a database would apply upon insert."""
+    for column in obj.__table__.columns:
+        if column.default is None or getattr(obj, column.key) is not None:
+            continue
+
+        if column.default.is_callable:
+            setattr(obj, column.key, column.default.arg(None))
+        else:
+            setattr(obj, column.key, copy.deepcopy(column.default.arg))
+
+
+class MemoryStore:
+    """Flows shared by all units of work of a MemoryBackend."""
+
+    def __init__(self):
+        self.flows: Dict[uuid.UUID, Flow] = {}
+
+        # Ids of Flows eligible to be run, by priority, oldest first.
+        self.ready: Dict[int, Dict[uuid.UUID, None]] = defaultdict(dict)
+
+        # Ids of Flows claimed by a unit of work.
+        self.claimed: Set[uuid.UUID] = set()
+
+        # Ids of Flows with deferred Tasks, by when they may be run again.
+        self.deferred: List[Tuple[dt, uuid.UUID]] = []
+
+        # Ids of Flows with blocked Tasks, by the Tasks' correlation keys.
+        self.correlated: Dict[str, Set[uuid.UUID]] = defaultdict(set)
+
+        # When the next occurrence of each schedule is, by key.
+        self.schedules: Dict[str, dt] = {}
+
+    def update(self, flow: Flow) -> None:
+        """Reconsider whether a Flow is eligible to be run."""
+        statuses = {task.status for task in flow.tasks}
+        for task in flow.tasks:
+            if task.status == Status.BLOCKED and task.correlation_key:
+                self.correlated[task.correlation_key].add(flow.id)
+
+        retry_at = max(
+            (task.retry_at for task in flow.tasks if task.retry_at), default=None
+        )
+        deferred = retry_at is not None and retry_at > dt.utcnow()
+        if deferred:
+            heapq.heappush(self.deferred, (retry_at, flow.id))
+
+        eligible = (
+            Status.PENDING in statuses
+            and Status.BLOCKED not in statuses
+            and not deferred
+            and flow.id not in self.claimed
+        )
+
+        if eligible:
+            self.ready[flow.priority].setdefault(flow.id, None)
+        elif flow.priority in self.ready:
+            self.ready[flow.priority].pop(flow.id, None)
+            if not self.ready[flow.priority]:
+                del self.ready[flow.priority]
+
+    def wake(self) -> int:
+        """Reconsider Flows whose deferred Tasks may be run by now."""
+        woken = 0
+        now = dt.utcnow()
+        while self.deferred and self.deferred[0][0] <= now:
+            _, flow_id = heapq.heappop(self.deferred)
+            flow = self.flows.get(flow_id)
+            if flow is None:
+                continue  # Purged meanwhile.
+
+            for task in flow.tasks:
+                if task.retry_at is not None and task.retry_at <= now:
+                    task.retry_at = None
+                    woken += 1
+            self.update(flow)
+
+        return woken
+
+
+# The store used unless another one is provided.
+store = MemoryStore()
+
+
+class MemoryBackend(Backend):
+    """Stores Flows in process memory."""
+
+    def __init__(self, memory_store: Optional[MemoryStore] = None):
+        self.store = memory_store or store
+        self._inserted: List[Flow] = []
+        self._claimed: Set[uuid.UUID] = set()
+        self._touched: Dict[uuid.UUID, Flow] = {}
+
+    async def claim(self) -> Optional[Flow]:
+        self.store.wake()
+        for priority in sorted(self.store.ready, reverse=True):
+            flow_id = next(iter(self.store.ready[priority]))
+            if conf.scheduling_policy == "shortest_expected":
+                flow_id = min(self.store.ready[priority], key=self._expected)
+            self.store.claimed.add(flow_id)
+            self._claimed.add(flow_id)
+
+            flow = self.store.flows[flow_id]
+            self._touched[flow_id] = flow
+            self.store.update(flow)
+            return flow
+
+        return None
+
+    def _expected(self, flow_id: uuid.UUID) -> float:
+        """Get a Flow's median duration, zero if never seen to succeed."""
+        name = self.store.flows[flow_id].name
+        return durations.expected(durations.FLOW, name) or 0.0
+
+    async def wake(self) -> int:
+        return self.store.wake()
+
+    async def claim_occurrence(
+        self, key: str, period: datetime.timedelta, horizon: datetime.datetime
+    ) -> Optional[datetime.datetime]:
+        now = dt.utcnow()
+        next_run_at = self.store.schedules.get(key, now)
+        if next_run_at > horizon:
+            return None
+
+        occurrence = max(next_run_at, now)
+        self.store.schedules[key] = occurrence + period
+        return occurrence
+
+    async def get(self, flow_id: uuid.UUID, lock: bool = False) -> Optional[Flow]:
+        flow = self.store.flows.get(flow_id)
+        if flow is not None:
+            self._touched[flow_id] = flow
+
+        return flow
+
+    async def list(
+        self, filters: FlowFilter, limit: Optional[int] = None
+    ) -> List[Flow]:
+        flows = sorted(
+            (flow for flow in self.store.flows.values() if filters.matches(flow)),
+            key=lambda flow: flow.created_at,
+            reverse=True,
+        )
+        return flows[:limit]
+
+    async def backlog(self) -> Dict[str, int]:
+        return Counter(
+            flow.name
+            for flow in self.store.flows.values()
+            if any(
+                task.status == Status.PENDING and task.retry_at is None
+                for task in flow.tasks
+            )
+        )
+
+    async def insert(self, flows: Iterable[Flow]) -> None:
+        for flow in flows:
+            _apply_defaults(flow)
+            for task in flow.tasks:
+                _apply_defaults(task)
+
+            self._inserted.append(flow)
+
+    async def unblock(self, bodies: Dict[str, Dict[str, Any]]) -> List[UnblockedTask]:
+        unblocked = []
+        for key, body in bodies.items():
+            for flow_id in self.store.correlated.pop(key, ()):
+                flow = self.store.flows[flow_id]
+                for task in flow.tasks:
+                    if task.status != Status.BLOCKED or task.correlation_key != key:
+                        continue
+
+                    task.status = Status.PENDING
+                    task.args = {"webhook_request_body": body}
+                    task.correlation_key = None
+                    task.updated_at = dt.utcnow()
+                    unblocked.append(
+                        UnblockedTask(flow.id, task.id, task.name, task.ordering, key)
+                    )
+
+                self._touched[flow_id] = flow
+
+        return unblocked
+
+    def _chunk(self, filters: FlowFilter, eligible, size: int) -> List[Flow]:
+        """Claim up to `size` matching Flows deemed eligible."""
+        flows = []
+        for flow in self.store.flows.values():
+            if len(flows) >= size:
+                break
+            if flow.id in self.store.claimed or not filters.matches(flow):
+                continue
+            if not eligible(flow):
+                continue
+
+            self.store.claimed.add(flow.id)
+            self._claimed.add(flow.id)
+            self._touched[flow.id] = flow
+            flows.append(flow)
+
+        return flows
+
+    async def retry_chunk(
+        self, filters: FlowFilter, size: int, until: datetime.datetime
+    ) -> BulkChunk:
+        tasks = 0
+
+        def failed(flow: Flow) -> bool:
+            return any(
+                task.status == Status.FAILURE and task.updated_at <= until
+                for task in flow.tasks
+            )
+
+        flows = self._chunk(filters, failed, size)
+        for flow in flows:
+            for task in flow.tasks:
+                if task.status != Status.FAILURE:
+                    continue
+
+                task.status = Status.PENDING
+                task.output = {}
+                task.started_at = task.finished_at = task.retry_at = None
+                task.attempt = 0
+                task.updated_at = dt.utcnow()
+                tasks += 1
+
+        return BulkChunk({flow.id: Status.PENDING for flow in flows}, tasks, {})
+
+    async def cancel_chunk(
+        self, filters: FlowFilter, size: int, until: datetime.datetime
+    ) -> BulkChunk:
+        tasks = 0
+        unfinished = {Status.PENDING, Status.BLOCKED}
+        flows = self._chunk(
+            filters,
+            lambda flow: flow.created_at <= until and flow.status() in unfinished,
+            size,
+        )
+        for flow in flows:
+            for task in flow.tasks:
+                if task.status not in unfinished:
+                    continue
+
+                task.status = Status.FAILURE
+                task.output = {"error": "cancelled"}
+                task.finished_at = task.updated_at = dt.utcnow()
+                task.retry_at = task.correlation_key = None
+                tasks += 1
+
+        return BulkChunk(
+            {flow.id: Status.FAILURE for flow in flows},
+            tasks,
+            {flow.id: flow.name for flow in flows if flow.parent_id is not None},
+        )
+
+    async def purge_chunk(
+        self, filters: FlowFilter, size: int, until: datetime.datetime
+    ) -> BulkChunk:
+        finished = {Status.SUCCESS, Status.FAILURE}
+        flows = self._chunk(
+            filters,
+            lambda flow: flow.created_at <= until and flow.status() in finished,
+            size,
+        )
+        for flow in flows:
+            del self.store.flows[flow.id]
+            del self._touched[flow.id]
+            for task in flow.tasks:
+                checkpoints.forget(task.id)
+            for priority in list(self.store.ready):
+                self.store.ready[priority].pop(flow.id, None)
+
+        return BulkChunk(
+            {flow.id: flow.status() for flow in flows},
+            sum(len(flow.tasks) for flow in flows),
+            {},
+        )
+
+    async def resolve_outputs(
+        self, values: Dict[Hashable, Optional[Dict[str, Any]]]
+    ) -> Dict[Hashable, Optional[Dict[str, Any]]]:
+        return values  # Outputs are never offloaded.
+
+    async def notify(self, channel: str, payloads: List[str]) -> None:
+        pass  # There are no other replicas.
+
+    async def commit(self) -> None:
+        for flow in self._inserted:
+            self.store.flows[flow.id] = flow
+            self._touched[flow.id] = flow
+
+        self._inserted = []
+        self._release()
+
+    async def close(self) -> None:
+        self._inserted = []
+        self._release()
+
+    def _release(self) -> None:
+        """Release claims and reconsider all Flows worked on."""
+        self.store.claimed -= self._claimed
+        self._claimed = set()
+
+        for flow in self._touched.values():
+            self.store.update(flow)
+        self._touched = {}
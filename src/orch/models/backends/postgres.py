@@ -0,0 +1,238 @@
+"""Provides a storage backend on top of Postgres."""
+
+import datetime
+import uuid
+from datetime import datetime as dt
+from typing import Any, Dict, Hashable, Iterable, List, Optional
+
+import sqlalchemy as sql
+import sqlalchemy.dialects.postgresql as psql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from orch import checkpoints
+from orch.database import async_session
+from orch.models.backends.base import (
+    Backend,
+    BulkChunk,
+    FlowFilter,
+    UnblockedTask,
+    flow_status,
+)
+from orch.models.blob import REF_KEY, Blob
+from orch.models.flow import Flow
+from orch.models.status import Status
+from orch.models.task import Task
+
+_claim_occurrence = sql.text(
+    """
+    INSERT INTO schedules AS s (key, next_run_at)
+    VALUES (:key, CAST(:now AS TIMESTAMP) + CAST(:period AS INTERVAL))
+    ON CONFLICT (key) DO UPDATE SET
+        next_run_at = GREATEST(s.next_run_at, CAST(:now AS TIMESTAMP))
+            + CAST(:period AS INTERVAL)
+    WHERE s.next_run_at <= CAST(:horizon AS TIMESTAMP)
+    RETURNING s.next_run_at - CAST(:period AS INTERVAL)
+    """
+)
+
+
+class PostgresBackend(Backend):
+    """Stores Flows in Postgres, claiming them with `SKIP LOCKED` row locks."""
+
+    def __init__(self, session: Optional[AsyncSession] = None):
+        self.session = session or async_session()
+
+    async def claim(self) -> Optional[Flow]:
+        return await Flow.get_next_eligible(self.session)
+
+    async def wake(self) -> int:
+        due = (
+            select(Task.id)
+            .filter(Task.retry_at <= dt.utcnow())
+            .with_for_update(skip_locked=True)
+        )
+        q = (
+            sql.update(Task)
+            .where(Task.id.in_(due.scalar_subquery()))
+            .values(retry_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        return (await self.session.execute(q)).rowcount
+
+    async def claim_occurrence(
+        self, key: str, period: datetime.timedelta, horizon: datetime.datetime
+    ) -> Optional[datetime.datetime]:
+        params = {"key": key, "period": period, "horizon": horizon, "now": dt.utcnow()}
+        return (await self.session.execute(_claim_occurrence, params)).scalar()
+
+    async def get(self, flow_id: uuid.UUID, lock: bool = False) -> Optional[Flow]:
+        return await Flow.get_by_id(self.session, flow_id, lock)
+
+    async def list(
+        self, filters: FlowFilter, limit: Optional[int] = None
+    ) -> List[Flow]:
+        q = filters.apply(select(Flow).order_by(Flow.created_at.desc()))
+        if limit is not None:
+            q = q.limit(limit)
+
+        return (await self.session.execute(q)).scalars().all()
+
+    async def backlog(self) -> Dict[str, int]:
+        q = (
+            select(Flow.name, sql.func.count(sql.distinct(Flow.id)))
+            .join(Task)
+            .filter(Task.status == Status.PENDING, Task.retry_at.is_(None))
+            .group_by(Flow.name)
+        )
+        return dict((await self.session.execute(q)).all())
+
+    async def insert(self, flows: Iterable[Flow]) -> None:
+        self.session.add_all(flows)
+
+    async def unblock(self, bodies: Dict[str, Dict[str, Any]]) -> List[UnblockedTask]:
+        if not bodies:
+            return []
+
+        # A Task blocking concurrently is not BLOCKED, nor has its key, until
+        # its run commits. Its key then matches nothing, rather than waiting
+        # on the run's lock, and is reported as unmatched, to be retried.
+        v = sql.values(
+            sql.column("key", sql.String),
+            sql.column("body", psql.JSONB),
+            name="v",
+        ).data(list(bodies.items()))
+        q = (
+            sql.update(Task)
+            .where(Task.correlation_key == v.c.key)
+            .where(Task.status == Status.BLOCKED)
+            .values(
+                status=Status.PENDING,
+                args=sql.func.jsonb_build_object(
+                    "webhook_request_body", sql.cast(v.c.body, psql.JSONB)
+                ),
+                correlation_key=None,
+                updated_at=dt.utcnow(),
+            )
+            .returning(Task.flow_id, Task.id, Task.name, Task.ordering, v.c.key)
+            .execution_options(synchronize_session=False)
+        )
+
+        return [UnblockedTask(*row) for row in await self.session.execute(q)]
+
+    async def _lock_chunk(self, filters: FlowFilter, condition, size: int):
+        """Lock up to `size` ids of matching Flows that no one else locked."""
+        q = (
+            filters.apply(select(Flow.id, flow_status()))
+            .filter(condition)
+            .limit(size)
+            .with_for_update(of=Flow, skip_locked=True)
+        )
+        return dict((await self.session.execute(q)).all())
+
+    async def _update_tasks(self, ids, statuses, **values) -> int:
+        """Update Tasks of the given Flows and statuses, returning their count."""
+        q = (
+            sql.update(Task)
+            .where(Task.flow_id.in_(ids))
+            .where(Task.status.in_(statuses))
+            .values(updated_at=dt.utcnow(), **values)
+            .execution_options(synchronize_session=False)
+        )
+        return (await self.session.execute(q)).rowcount
+
+    async def retry_chunk(
+        self, filters: FlowFilter, size: int, until: datetime.datetime
+    ) -> BulkChunk:
+        failed = (
+            select(Task.id)
+            .filter(Task.flow_id == Flow.id)
+            .filter(Task.status == Status.FAILURE)
+            .filter(Task.updated_at <= until)
+            .exists()
+        )
+        flows = await self._lock_chunk(filters, failed, size)
+        if not flows:
+            return BulkChunk({}, 0, {})
+
+        tasks = await self._update_tasks(
+            list(flows),
+            [Status.FAILURE],
+            status=Status.PENDING,
+            output={},
+            started_at=None,
+            finished_at=None,
+            retry_at=None,
+            attempt=0,
+        )
+        return BulkChunk(dict.fromkeys(flows, Status.PENDING), tasks, {})
+
+    async def cancel_chunk(
+        self, filters: FlowFilter, size: int, until: datetime.datetime
+    ) -> BulkChunk:
+        unfinished = flow_status().in_([Status.PENDING, Status.BLOCKED])
+        flows = await self._lock_chunk(
+            filters, sql.and_(unfinished, Flow.created_at <= until), size
+        )
+        if not flows:
+            return BulkChunk({}, 0, {})
+
+        tasks = await self._update_tasks(
+            list(flows),
+            [Status.PENDING, Status.BLOCKED],
+            status=Status.FAILURE,
+            output={"error": "cancelled"},
+            finished_at=dt.utcnow(),
+            retry_at=None,
+            correlation_key=None,
+        )
+        q = (
+            select(Flow.id, Flow.name)
+            .filter(Flow.id.in_(list(flows)))
+            .filter(Flow.parent_id.isnot(None))
+        )
+        children = dict((await self.session.execute(q)).all())
+        return BulkChunk(dict.fromkeys(flows, Status.FAILURE), tasks, children)
+
+    async def purge_chunk(
+        self, filters: FlowFilter, size: int, until: datetime.datetime
+    ) -> BulkChunk:
+        finished = flow_status().in_([Status.SUCCESS, Status.FAILURE])
+        flows = await self._lock_chunk(
+            filters, sql.and_(finished, Flow.created_at <= until), size
+        )
+        if not flows:
+            return BulkChunk({}, 0, {})
+
+        task_ids = select(Task.id).filter(Task.flow_id.in_(list(flows)))
+        await self.session.execute(
+            sql.delete(checkpoints.table).where(
+                checkpoints.table.c.task_id.in_(task_ids.scalar_subquery())
+            )
+        )
+        q = (
+            sql.delete(Task)
+            .where(Task.flow_id.in_(list(flows)))
+            .returning(Task.output[REF_KEY].astext)
+        )
+        digests = (await self.session.execute(q)).scalars().all()
+        await self.session.execute(sql.delete(Flow).where(Flow.id.in_(list(flows))))
+        await Blob.collect(self.session, filter(None, digests))
+        return BulkChunk(flows, len(digests), {})
+
+    async def resolve_outputs(
+        self, values: Dict[Hashable, Optional[Dict[str, Any]]]
+    ) -> Dict[Hashable, Optional[Dict[str, Any]]]:
+        return await Blob.resolve(self.session, values)
+
+    async def notify(self, channel: str, payloads: List[str]) -> None:
+        payload = sql.func.unnest(sql.cast(payloads, psql.ARRAY(sql.Text)))
+        await self.session.execute(
+            sql.select(sql.func.pg_notify(channel, payload.column_valued()))
+        )
+
+    async def commit(self) -> None:
+        await self.session.commit()
+
+    async def close(self) -> None:
+        await self.session.close()
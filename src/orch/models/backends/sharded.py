@@ -0,0 +1,150 @@
+"""Provides a storage backend spreading Flows across shards.
+
+Each shard is a backend of its own, see `orch.sharding`. Work touching a
+single Flow is routed to its shard, while listings and correlated unblocking
+are scattered across all shards, and their results gathered. Committing is
+not atomic across shards, which only matters to work spanning several.
+"""
+
+import asyncio
+import datetime
+import heapq
+import itertools
+import uuid
+from collections import Counter, defaultdict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence
+
+import orch.sharding as sharding
+from orch.models.backends.base import Backend, BulkChunk, FlowFilter, UnblockedTask
+from orch.models.flow import Flow
+
+
+class ShardedBackend(Backend):
+    """Routes work to the backends of each shard, by Flow id."""
+
+    def __init__(self, shards: List[Backend], assigned: Sequence[int]):
+        self.shards = shards
+        self.assigned = assigned
+
+        # Where to start claiming from, so as to take turns across shards.
+        self._turn = 0
+
+    @property
+    def primary(self) -> Backend:
+        """The backend of the primary database, coordinating replicas."""
+        return self.shards[0]
+
+    async def claim(self) -> Optional[Flow]:
+        for i in range(len(self.assigned)):
+            turn = (self._turn + i) % len(self.assigned)
+            flow = await self.shards[self.assigned[turn]].claim()
+            if flow is not None:
+                self._turn = turn + 1
+                return flow
+
+        return None
+
+    async def wake(self) -> int:
+        return sum([await self.shards[shard].wake() for shard in self.assigned])
+
+    async def claim_occurrence(
+        self, key: str, period: datetime.timedelta, horizon: datetime.datetime
+    ) -> Optional[datetime.datetime]:
+        return await self.primary.claim_occurrence(key, period, horizon)
+
+    async def get(self, flow_id: uuid.UUID, lock: bool = False) -> Optional[Flow]:
+        return await self.shards[sharding.of(flow_id)].get(flow_id, lock)
+
+    async def list(
+        self, filters: FlowFilter, limit: Optional[int] = None
+    ) -> List[Flow]:
+        listed = await asyncio.gather(
+            *(shard.list(filters, limit) for shard in self.shards)
+        )
+        flows = heapq.merge(*listed, key=lambda flow: flow.created_at, reverse=True)
+        return list(itertools.islice(flows, limit))
+
+    async def backlog(self) -> Dict[str, int]:
+        counts = Counter()
+        for counted in await asyncio.gather(
+            *(shard.backlog() for shard in self.shards)
+        ):
+            counts.update(counted)
+
+        return counts
+
+    async def insert(self, flows: Iterable[Flow]) -> None:
+        by_shard = defaultdict(list)
+        for flow in flows:
+            by_shard[sharding.of(flow.id)].append(flow)
+
+        for shard, inserted in by_shard.items():
+            await self.shards[shard].insert(inserted)
+
+    async def unblock(self, bodies: Dict[str, Dict[str, Any]]) -> List[UnblockedTask]:
+        unblocked = await asyncio.gather(
+            *(shard.unblock(bodies) for shard in self.shards)
+        )
+        return [task for tasks in unblocked for task in tasks]
+
+    async def _chunk(
+        self,
+        operation: str,
+        filters: FlowFilter,
+        size: int,
+        until: datetime.datetime,
+    ):
+        """Apply a bulk operation's chunk to shards in turn, up to `size` Flows."""
+        flows, tasks, children = {}, 0, {}
+        for shard in self.shards:
+            apply_chunk = getattr(shard, f"{operation}_chunk")
+            chunk = await apply_chunk(filters, size - len(flows), until)
+            flows.update(chunk.flows)
+            tasks += chunk.tasks
+            children.update(chunk.children)
+            if len(flows) >= size:
+                break
+
+        return BulkChunk(flows, tasks, children)
+
+    async def retry_chunk(
+        self, filters: FlowFilter, size: int, until: datetime.datetime
+    ) -> BulkChunk:
+        return await self._chunk("retry", filters, size, until)
+
+    async def cancel_chunk(
+        self, filters: FlowFilter, size: int, until: datetime.datetime
+    ) -> BulkChunk:
+        return await self._chunk("cancel", filters, size, until)
+
+    async def purge_chunk(
+        self, filters: FlowFilter, size: int, until: datetime.datetime
+    ) -> BulkChunk:
+        return await self._chunk("purge", filters, size, until)
+
+    async def resolve_outputs(
+        self, values: Dict[Hashable, Optional[Dict[str, Any]]]
+    ) -> Dict[Hashable, Optional[Dict[str, Any]]]:
+        """Resolve outputs on their Tasks' shards, as they are keyed by Task id."""
+        by_shard = defaultdict(dict)
+        for task_id, value in values.items():
+            by_shard[sharding.of(task_id)][task_id] = value
+
+        resolved = {}
+        for shard, shard_values in by_shard.items():
+            resolved.update(await self.shards[shard].resolve_outputs(shard_values))
+
+        return resolved
+
+    async def notify(self, channel: str, payloads: List[str]) -> None:
+        # Replicas listen on the primary database.
+        await self.primary.notify(channel, payloads)
+
+    async def commit(self) -> None:
+        # Commit the primary last, so that notifications follow the work.
+        for shard in reversed(self.shards):
+            await shard.commit()
+
+    async def close(self) -> None:
+        for shard in self.shards:
+            await shard.close()
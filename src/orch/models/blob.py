@@ -0,0 +1,131 @@
+"""Provides a content addressed store for large Task outputs.
+
+Blobs are shared by all Tasks with the same output, and deleted once the last
+Task referring to them is purged.
+"""
+
+import hashlib
+import zlib
+from datetime import datetime as dt
+from typing import Any, Dict, Hashable, Iterable, Optional
+
+import sqlalchemy as sql
+import sqlalchemy.dialects.postgresql as psql
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+import orch.config as conf
+import orch.serialization as serialization
+from orch.database import Base
+from orch.exceptions import BlobNotFound
+
+# Key marking an inline Task output as a reference to a Blob.
+REF_KEY = "$blob"
+
+# Deletes the given Blobs that no Task refers to anymore. Those stored again
+# meanwhile, by a Task yet to commit, are spared: storing them again locks
+# them and updates `created_at`, which is then checked anew.
+_collect = sql.text(
+    """
+    DELETE FROM blobs AS b
+    USING (
+        SELECT digest, created_at FROM blobs
+        WHERE digest = ANY(:digests)
+        AND NOT EXISTS (
+            SELECT FROM tasks WHERE output ->> '$blob' = blobs.digest
+        )
+    ) AS unreferenced
+    WHERE b.digest = unreferenced.digest
+    AND b.created_at = unreferenced.created_at
+    """
+).bindparams(sql.bindparam("digests", type_=psql.ARRAY(sql.String)))
+
+
+class Blob(Base):
+    """A compressed JSON value, stored apart from the Task that produced it."""
+
+    __tablename__ = "blobs"
+
+    # SHA-256 of the uncompressed JSON value.
+    digest = sql.Column(sql.String, primary_key=True, nullable=False)
+
+    # The zlib compressed JSON value.
+    data = sql.Column(sql.LargeBinary, nullable=False)
+
+    # Size in bytes of the uncompressed JSON value.
+    size = sql.Column(sql.Integer, nullable=False)
+
+    # When the Blob was last stored.
+    created_at = sql.Column(sql.DateTime, default=dt.utcnow, nullable=False)
+
+    @staticmethod
+    def is_ref(value: Any) -> bool:
+        """Return whether a Task output is a reference to a Blob."""
+        return isinstance(value, dict) and REF_KEY in value
+
+    @staticmethod
+    async def offload(session: AsyncSession, value: Dict[str, Any]) -> Dict[str, Any]:
+        """Store a value as a Blob if it is too large to be kept inline.
+
+        Returns either the value itself or a reference to the stored Blob.
+        """
+        if not conf.output_offload_threshold or not value or Blob.is_ref(value):
+            return value
+
+        raw = serialization.dumpb(value)
+        if len(raw) <= conf.output_offload_threshold:
+            return value
+
+        digest = hashlib.sha256(raw).hexdigest()
+        q = psql.insert(Blob).values(
+            digest=digest,
+            data=zlib.compress(raw),
+            size=len(raw),
+            created_at=dt.utcnow(),
+        )
+        q = q.on_conflict_do_update(
+            index_elements=[Blob.digest],
+            set_={"created_at": q.excluded.created_at},
+        )
+        await session.execute(q)
+
+        return {REF_KEY: digest, "size": len(raw)}
+
+    @staticmethod
+    async def collect(session: AsyncSession, digests: Iterable[str]) -> int:
+        """Delete the given Blobs if no Task refers to them anymore.
+
+        Returns how many were deleted.
+        """
+        digests = sorted(set(digests))
+        if not digests:
+            return 0
+
+        return (await session.execute(_collect, {"digests": digests})).rowcount
+
+    @staticmethod
+    async def resolve(
+        session: AsyncSession, values: Dict[Hashable, Optional[Dict[str, Any]]]
+    ) -> Dict[Hashable, Optional[Dict[str, Any]]]:
+        """Replace any Blob references among the given values with their data.
+
+        All referenced Blobs are loaded with a single query. Raises
+        `BlobNotFound` if any of them is no longer stored.
+        """
+        digests = {val[REF_KEY] for val in values.values() if Blob.is_ref(val)}
+        if not digests:
+            return values
+
+        q = select(Blob.digest, Blob.data).filter(Blob.digest.in_(digests))
+        blobs = {
+            digest: serialization.loads(zlib.decompress(data))
+            for digest, data in (await session.execute(q)).all()
+        }
+        missing = digests - blobs.keys()
+        if missing:
+            raise BlobNotFound(min(missing))
+
+        return {
+            key: blobs[val[REF_KEY]] if Blob.is_ref(val) else val
+            for key, val in values.items()
+        }
@@ -1,25 +1,41 @@
 import uuid
 from datetime import datetime as dt
+from datetime import timedelta
 from typing import Any, Dict, Optional
 
 import sqlalchemy as sql
 import sqlalchemy.dialects.postgresql as psql
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_object_session
 from sqlalchemy.ext.orderinglist import ordering_list
 from sqlalchemy.future import select
 from sqlalchemy.orm import aliased, relationship
 
+import orch.config as conf
+import orch.durations as durations
+import orch.sharding as sharding
 from orch.database import Base
 from orch.flows import flows
 from orch.logger import logger
+from orch.models.blob import Blob
 from orch.models.status import Status
 from orch.models.task import Task
+from orch.subflows import ChildFlow
 
 
 class Flow(Base):
     """Describes a Flow in the database, a series of Tasks."""
 
     __tablename__ = "flows"
+    __table_args__ = (
+        # Listing Flows by name, newest first.
+        sql.Index("ix_flows_name_created_at", "name", "created_at"),
+        # Listing child Flows.
+        sql.Index(
+            "ix_flows_parent_id",
+            "parent_id",
+            postgresql_where=sql.text("parent_id IS NOT NULL"),
+        ),
+    )
 
     # A unique id of a running Flow
     id = sql.Column(psql.UUID(as_uuid=True), primary_key=True, nullable=False)
@@ -47,33 +63,62 @@ class Flow(Base):
     # What is the priority in the queue at execution, zero default.
     priority = sql.Column(sql.Integer, default=0, nullable=False)
 
+    # When the Flow was scheduled to start, if delayed.
+    run_at = sql.Column(sql.DateTime, nullable=True)
+
+    # The Flow whose Task started this one and waits for it, if a child.
+    parent_id = sql.Column(psql.UUID(as_uuid=True), nullable=True)
+
+    # A child Flow started by the Task last run, to be inserted along with it.
+    child = None
+
     @staticmethod
     def from_req(
         name: str,
         args: Dict[str, Any],
         webhook_url: Optional[str] = None,
         priority: Optional[int] = 0,
+        run_at: Optional[dt] = None,
+        shard_key: Optional[str] = None,
+        child: Optional[ChildFlow] = None,
+        parent_id: Optional[uuid.UUID] = None,
     ) -> "Flow":
-        """Create and return a Flow with its associated Tasks"""
+        """Create and return a Flow with its associated Tasks.
+
+        A Flow given a future `run_at` has all its Tasks deferred until then.
+        Flows given the same `shard_key` are stored in the same shard. A
+        child Flow is given its id upfront, along with its parent's.
+        """
         assert name in flows, f"cannot create undefined flow: {name}"
         args = flows[name](**args)  # Ensure arguments schema matches.
 
+        if child is not None:
+            flow_id = child.id
+        else:
+            flow_id = sharding.new_id(sharding.of_key(shard_key) if shard_key else None)
+
         flow = Flow(
-            id=uuid.uuid4(),
+            id=flow_id,
             name=name,
             args=args.dict(),
             webhook_url=webhook_url,
             priority=priority,
+            run_at=run_at,
+            parent_id=parent_id,
         )
 
+        if run_at is not None and run_at <= dt.utcnow():
+            run_at = None
+
         for i, task in enumerate(flows[name].tasks(args)):
             flow.tasks.append(
                 Task(
-                    id=uuid.uuid4(),
+                    id=sharding.new_id(sharding.of(flow_id)),
                     ordering=i,
                     args=task.dict(),
                     name=task.__class__.get_name(),
                     flow_id=flow.id,
+                    retry_at=run_at,
                 )
             )
 
@@ -84,11 +129,8 @@ class Flow(Base):
         session: AsyncSession, flow_id: uuid.UUID, lock=False
     ) -> Optional["Flow"]:
         """Get a Flow by its unique id."""
-        q = select(Flow).filter(Flow.id == flow_id).limit(1)
-        if lock:
-            q = q.with_for_update(skip_locked=False)
-
-        r = (await session.execute(q)).first()
+        q = _by_id_locked if lock else _by_id
+        r = (await session.execute(q, {"flow_id": flow_id})).first()
         return r._mapping[Flow] if r else None
 
     def status(self) -> Status:
@@ -114,6 +156,35 @@ class Flow(Base):
             max(task.finished_at for task in self.tasks) - self.created_at
         ).total_seconds()
 
+    def eta(self) -> Optional[dt]:
+        """Predict when this pending Flow finishes, if it can be told.
+
+        Remaining Tasks are expected to run for their median durations, one
+        after the other, from now or from when they are deferred until. Time
+        spent queued is not accounted for. Blocked Flows cannot be told, nor
+        can Flows with Tasks never seen to succeed.
+        """
+        if self.status() != Status.PENDING:
+            return None
+
+        now = eta = dt.utcnow()
+        for task in self.tasks:
+            if task.status == Status.SUCCESS:
+                continue
+
+            expected = durations.expected(durations.TASK, task.name)
+            if expected is None:
+                return None
+
+            if task.retry_at is not None:
+                eta = max(eta, task.retry_at)
+            elif task.started_at is not None and task.finished_at is None:
+                # Running, for some time already.
+                expected = max(expected - (now - task.started_at).total_seconds(), 0)
+            eta += timedelta(seconds=expected)
+
+        return eta
+
     def outputs(self) -> Dict[str, Any]:
         """Return the Flow's collected Task outputs."""
         return {
@@ -122,6 +193,15 @@ class Flow(Base):
             if task.output is not None and task.status != Status.PENDING
         }
 
+    async def resolved_outputs(self) -> Dict[str, Any]:
+        """Return the Flow's collected Task outputs, loading offloaded ones."""
+        outputs = self.outputs()
+        session = async_object_session(self)
+        if session is None:
+            return outputs
+
+        return await Blob.resolve(session, outputs)
+
     def final_output(self) -> Dict[str, Any]:
         """Returns the final output of the flow"""
         return self.tasks[-1].output
@@ -156,18 +236,8 @@ class Flow(Base):
         session: AsyncSession, flow_id, task_name
     ) -> Optional[Task]:
         """Get a task that is of status BLOCKED, if any."""
-        q = (
-            select(Task)
-            .join(Flow)
-            .filter(Flow.id == flow_id)
-            .filter(Task.name == task_name)
-            .filter(Task.status == Status.BLOCKED)
-            .with_for_update(of=Task, skip_locked=True)
-            .execution_options(populate_existing=True)
-            .limit(1)
-        )
-
-        r = (await session.execute(q)).first()
+        params = {"flow_id": flow_id, "task_name": task_name}
+        r = (await session.execute(_blocked_task_by_name, params)).first()
         found_task = r._mapping[Task] if r else None
 
         return found_task
@@ -178,29 +248,18 @@ class Flow(Base):
 
         This is done by finding pending tasks within flows that contain no
         running or failed tasks, as these signify flows that are being run by
-        another instance or flows that have failed altogether.
+        another instance or flows that have failed altogether. Flows whose
+        tasks are deferred until later are skipped as well. Deferred tasks are
+        left out of the pending tasks index until woken up, so that delayed
+        flows are never scanned. Flows of the same priority are taken oldest
+        first, or expected shortest first, as per `scheduling_policy`, then
+        oldest first.
         """
-        flow_blocked = aliased(Flow)
-
-        q_blocked = (
-            select(flow_blocked.id)
-            .join(Task)
-            .filter(Task.status == Status.BLOCKED)
-            .filter(flow_blocked.id == Flow.id)
-            .exists()
-        )
-
-        q = (
-            select(Flow)
-            .join(Task)
-            .filter(Task.status == Status.PENDING)
-            .filter(~q_blocked)
-            .with_for_update(skip_locked=True)
-            .order_by(sql.text("priority desc"))
-            .limit(1)
-        )
+        q = _next_eligible
+        if conf.scheduling_policy == "shortest_expected":
+            q = _next_shortest_expected
 
-        r = (await session.execute(q)).first()
+        r = (await session.execute(q, {"now": dt.utcnow()})).first()
         found_flow = r._mapping[Flow] if r else None
 
         return found_flow
@@ -217,7 +276,12 @@ class Flow(Base):
                 return
 
     async def run_next_task(self) -> Optional[Status]:
-        """Run this Flow's next eligible Task, returning its new Status."""
+        """Run this Flow's next eligible Task, returning its new Status.
+
+        A child Flow the Task started is left in `child`, to be inserted by
+        the caller, along with the Task's changes.
+        """
+        self.child = None
         with logger.contextualize(
             flow_name=self.name,
             flow_id=str(self.id),
@@ -234,18 +298,35 @@ class Flow(Base):
                     logger.warning("will not rerun failed task")
                     break
 
+                # Leave the Task pending if it is rate limited.
+                if not await task.acquire():
+                    break
+
                 # Collect all the Task outputs of the Flow.
-                outputs = self.outputs()
+                outputs = await self.resolved_outputs()
                 outputs = {
                     key: val for outs in outputs.values() for key, val in outs.items()
                 }
 
                 try:
                     outputs["flow"] = self
-                    await task.run(outputs)
+                    child = await task.run(outputs)
+                    if child is not None:
+                        self.child = Flow.from_req(
+                            child.name,
+                            child.args,
+                            priority=child.priority,
+                            child=child,
+                            parent_id=self.id,
+                        )
                     if task.status == Status.FAILURE:
                         self.set_pending_tasks_failed()
 
+                    # Keep large outputs out of the tasks table.
+                    session = async_object_session(self)
+                    if session is not None and task.status == Status.SUCCESS:
+                        task.output = await Blob.offload(session, task.output)
+
                 except Exception as err:
                     logger.opt(exception=err).error("task error")
                     self.set_pending_tasks_failed()
@@ -254,3 +335,80 @@ class Flow(Base):
                 return task.status
 
             return None
+
+
+# Hot statements, built once rather than upon each call. SQLAlchemy then
+# finds them in its compiled cache right away, and asyncpg reuses the
+# prepared statements it caches per connection for them.
+
+_by_id = select(Flow).filter(Flow.id == sql.bindparam("flow_id")).limit(1)
+
+_by_id_locked = _by_id.with_for_update(skip_locked=False)
+
+_blocked_task_by_name = (
+    select(Task)
+    .join(Flow)
+    .filter(Flow.id == sql.bindparam("flow_id"))
+    .filter(Task.name == sql.bindparam("task_name"))
+    .filter(Task.status == Status.BLOCKED)
+    .with_for_update(of=Task, skip_locked=True)
+    .execution_options(populate_existing=True)
+    .limit(1)
+)
+
+
+def _next_eligible_statement(shortest_expected: bool = False):
+    """Build a statement `Flow.get_next_eligible` runs.
+
+    If `shortest_expected`, Flows of the same priority are ordered by their
+    median duration, Flows of names never seen to succeed coming first. Ties
+    are broken by creation time, oldest first.
+    """
+    flow_blocked = aliased(Flow)
+
+    q_blocked = (
+        select(flow_blocked.id)
+        .join(Task)
+        .filter(Task.status == Status.BLOCKED)
+        .filter(flow_blocked.id == Flow.id)
+        .exists()
+    )
+
+    # Flows whose next Task was deferred until later. Tasks are aliased, as
+    # they would otherwise be correlated with the Tasks of the outer query.
+    task_deferred = aliased(Task)
+    q_deferred = (
+        select(task_deferred.id)
+        .filter(task_deferred.flow_id == Flow.id)
+        .filter(task_deferred.retry_at > sql.bindparam("now"))
+        .exists()
+    )
+
+    order = [sql.text("priority desc")]
+    if shortest_expected:
+        stats = durations.stats
+        q_median = (
+            select(stats.c.median)
+            .filter(stats.c.kind == durations.FLOW)
+            .filter(stats.c.name == Flow.name)
+            .scalar_subquery()
+        )
+        order.append(q_median.asc().nullsfirst())
+    order.append(Flow.created_at.asc())
+
+    return (
+        select(Flow)
+        .join(Task)
+        .filter(Task.status == Status.PENDING)
+        .filter(Task.retry_at.is_(None))
+        .filter(~q_blocked)
+        .filter(~q_deferred)
+        .with_for_update(skip_locked=True)
+        .order_by(*order)
+        .limit(1)
+    )
+
+
+_next_eligible = _next_eligible_statement()
+
+_next_shortest_expected = _next_eligible_statement(shortest_expected=True)
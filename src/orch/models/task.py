@@ -1,13 +1,24 @@
 from datetime import datetime as dt
+from datetime import timedelta
 from typing import Any, Dict, Optional
 
 import sqlalchemy as sql
 import sqlalchemy.dialects.postgresql as psql
 
+from orch import (
+    profiling,
+    progress,
+    ratelimit,
+    resources,
+    tracing,
+    watchdog,
+)
 from orch.database import Base
 from orch.exceptions import OrchException
+from orch.flows import flows
 from orch.logger import logger
 from orch.models.status import Status
+from orch.subflows import ChildFlow
 from orch.tasks import tasks
 
 
@@ -15,6 +26,41 @@ class Task(Base):
     """A sub-element of a Flow that can be run"""
 
     __tablename__ = "tasks"
+    __table_args__ = (
+        # Loading a Flow's Tasks in order.
+        sql.Index("ix_tasks_flow_id_ordering", "flow_id", "ordering"),
+        # Finding a Flow's pending and blocked Tasks while dequeueing.
+        sql.Index(
+            "ix_tasks_flow_id_pending",
+            "flow_id",
+            postgresql_where=sql.text("status = 'PENDING' AND retry_at IS NULL"),
+        ),
+        sql.Index(
+            "ix_tasks_flow_id_name_blocked",
+            "flow_id",
+            "name",
+            postgresql_where=sql.text("status = 'BLOCKED'"),
+        ),
+        # Unblocking Tasks by correlation key.
+        sql.Index(
+            "ix_tasks_correlation_key",
+            "correlation_key",
+            postgresql_where=sql.text("correlation_key IS NOT NULL"),
+        ),
+        # Finding a Flow's deferred Tasks while dequeueing.
+        sql.Index(
+            "ix_tasks_flow_id_retry_at",
+            "flow_id",
+            "retry_at",
+            postgresql_where=sql.text("retry_at IS NOT NULL"),
+        ),
+        # Waking deferred Tasks up once due.
+        sql.Index(
+            "ix_tasks_retry_at",
+            "retry_at",
+            postgresql_where=sql.text("retry_at IS NOT NULL"),
+        ),
+    )
 
     # A unique id representing a run Task.
     id = sql.Column(psql.UUID(as_uuid=True), primary_key=True, nullable=False)
@@ -28,12 +74,10 @@ class Task(Base):
     )
 
     # The Task's ordering within the Flow. Tasks are executed in order.
-    ordering = sql.Column(sql.Integer, nullable=False, index=True)
+    ordering = sql.Column(sql.Integer, nullable=False)
 
     # The Task's status.
-    status = sql.Column(
-        sql.Enum(Status), default=Status.PENDING, nullable=False, index=True
-    )
+    status = sql.Column(sql.Enum(Status), default=Status.PENDING, nullable=False)
 
     # Input arguments provided to this Task as arbitrary JSON.
     args = sql.Column(psql.JSONB, nullable=False)
@@ -50,6 +94,20 @@ class Task(Base):
     # When the Task finished, either with success or failure.
     finished_at = sql.Column(sql.DateTime, nullable=True)
 
+    # When a deferred pending Task may be run again, if deferred. This is
+    # cleared once due, putting the Task back in the pending Tasks index.
+    retry_at = sql.Column(sql.DateTime, nullable=True)
+
+    # How many times the Task was run since it was last retried manually.
+    attempt = sql.Column(sql.Integer, default=0, nullable=False)
+
+    # A key by which a blocked Task can be unblocked, if it registered one.
+    correlation_key = sql.Column(sql.String, nullable=True)
+
+    # Whether the Task last run succeeded with a checkpoint, to be cleared once
+    # its success is committed.
+    checkpointed = False
+
     def is_done(self) -> bool:
         """Return whether the Task is in a non-pending, non-running state."""
         return self.status not in (Status.PENDING, Status.BLOCKED)
@@ -61,30 +119,96 @@ class Task(Base):
 
         return None
 
-    async def run(self, outputs: Dict[str, Any]) -> None:
-        """Run this Task."""
+    async def acquire(self) -> bool:
+        """Take a token of this Task's rate limit, if it declares one.
+
+        If the rate limit is exhausted, the Task is deferred until the rate
+        limit's bucket refills, and False is returned.
+        """
+        limit = tasks[self.name].Task.rate_limit
+        if limit is None:
+            return True
+
+        wait = await ratelimit.acquire(limit)
+        if wait is None:
+            return True
+
+        now = dt.utcnow()
+        self.updated_at = now
+        self.retry_at = now + timedelta(seconds=wait)
+        logger.bind(task_id=str(self.id), task_name=self.name).bind(
+            rate_limit_key=limit.key, rate_limit_wait=wait
+        ).info("task rate limited")
+        return False
+
+    def _defer_retry(self, err: Exception) -> None:
+        """Leave the failed Task pending until its retry, if it is retryable."""
+        policy = tasks[self.name].Task.retry_policy
+        if policy is None:
+            return
+
+        delay = policy.delay(err, self.attempt)
+        if delay is None:
+            return
+
+        self.status = Status.PENDING
+        self.retry_at = dt.utcnow() + timedelta(seconds=delay)
+        logger.bind(task_attempt=self.attempt, task_retry_delay=delay).info(
+            "task retry deferred"
+        )
+
+    async def run(self, outputs: Dict[str, Any]) -> Optional[ChildFlow]:
+        """Run this Task, returning the child Flow it started, if any."""
+        child = None
+        self.checkpointed = False
         now = dt.utcnow()
         self.updated_at = now
         self.started_at = now
         self.finished_at = None
-
-        with logger.contextualize(task_id=str(self.id), task_name=self.name):
-            logger.bind(task_status=self.status.value).info("running task")
+        self.retry_at = None
+        self.attempt = (self.attempt or 0) + 1
+
+        with logger.contextualize(
+            task_id=str(self.id), task_name=self.name
+        ), tracing.span(
+            "task.run", self.flow_id, task_id=str(self.id), task_name=self.name
+        ) as span:
+            logger.bind(task_status=self.status.value).bind(
+                task_attempt=self.attempt
+            ).info("running task")
+            reporter = progress.Reporter(self.flow_id, self.id)
 
             try:
                 # Run task within context.
                 task = tasks[self.name].Task(**self.args)
-                default_args = {"flow_id": self.flow_id}
+                default_args = {"flow_id": self.flow_id, "task_id": self.id}
                 task._context.update({**default_args, **outputs})
-                output = await task()
+                object.__setattr__(task, "_progress", reporter)
+                async with resources.provide(task.resources) as provided:
+                    object.__setattr__(task, "_resources", provided)
+                    with profiling.profile(self.name, self.id), watchdog.running(
+                        self.name, self.flow_id
+                    ):
+                        output = await task()
 
                 # Set its status and output depending on behaviour.
                 if output is not None:
                     self.status = Status.SUCCESS
                     self.output = output.dict()
+                    self.checkpointed = task._checkpointed
                 else:
+                    started = task._child
+                    if started is not None:
+                        if started.name not in flows:
+                            raise OrchException(f"no such flow: {started.name}")
+                        flows[started.name](**started.args)  # Ensure schema.
+                        child = started
+
                     self.status = Status.BLOCKED
-                    logger.bind(task_status=self.status.value).info("task blocked")
+                    self.correlation_key = task._correlation_key
+                    logger.bind(task_status=self.status.value).bind(
+                        correlation_key=self.correlation_key
+                    ).info("task blocked")
 
             except (OrchException, Exception) as err:
                 logger.opt(exception=err).error("task error")
@@ -94,13 +218,19 @@ class Task(Base):
                     else "internal server error"
                 }
                 self.status = Status.FAILURE
+                self._defer_retry(err)
 
             finally:
+                await reporter.close()
                 now = dt.utcnow()
                 self.updated_at = now
+                span.set(task_status=self.status.value, task_attempt=self.attempt)
+
                 # If done, we log the time diff.
                 if self.is_done():
                     self.finished_at = now
                     logger.bind(task_status=self.status.value).bind(
                         task_duration=self.duration()
                     ).info("task finished")
+
+        return child
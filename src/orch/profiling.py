@@ -0,0 +1,148 @@
+"""Provides sampled profiles of Task runs, stored for later inspection.
+
+Task names listed in `profile_tasks` are profiled with cProfile for a
+`profile_sample_rate` fraction of their runs. Profiles are stored gzipped on
+disk, under `profile_dir`, keeping the latest `profile_max_count` per Task
+name. Nothing is done for other Tasks, nor at all when no names are listed.
+
+As cProfile profiles the whole thread, coroutines running while a profiled
+Task awaits show up in its profile too. Only one Task is profiled at a time.
+"""
+
+import asyncio
+import contextlib
+import cProfile
+import gzip
+import io
+import marshal
+import pstats
+import random
+import re
+import time
+import uuid
+from datetime import datetime as dt
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import orch.config as conf
+from orch.logger import logger
+
+# Whether a Task is being profiled right now.
+_active = False
+
+
+def _dir(task_name: str) -> Path:
+    return Path(conf.profile_dir) / task_name
+
+
+def _store(task_name: str, name: str, data: bytes) -> None:
+    """Write a profile, then drop the oldest ones beyond the maximum count."""
+    path = _dir(task_name)
+    path.mkdir(parents=True, exist_ok=True)
+    (path / f"{name}.prof.gz").write_bytes(gzip.compress(data))
+
+    for old in sorted(path.glob("*.prof.gz"))[: -conf.profile_max_count]:
+        old.unlink(missing_ok=True)
+
+
+def _stored(future: asyncio.Future) -> None:
+    if future.exception() is not None:
+        logger.opt(exception=future.exception()).error("could not store profile")
+
+
+@contextlib.contextmanager
+def profile(task_name: str, task_id: uuid.UUID) -> Iterator[None]:
+    """Profile a Task's run, if its name is listed and it is sampled."""
+    global _active
+
+    if (
+        task_name not in conf.profile_tasks
+        or _active
+        or random.random() >= conf.profile_sample_rate
+    ):
+        yield
+        return
+
+    _active = True
+    profiler = cProfile.Profile()
+    started_at = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _active = False
+        _save(task_name, task_id, profiler, time.perf_counter() - started_at)
+
+
+def _save(
+    task_name: str, task_id: uuid.UUID, profiler: cProfile.Profile, duration: float
+) -> None:
+    profiler.create_stats()
+    data = marshal.dumps(profiler.stats)
+    name = f"{dt.utcnow():%Y%m%dT%H%M%S.%f}-{task_id}-{duration * 1000:.0f}ms"
+
+    # Keep writing to disk off the event loop.
+    future = asyncio.get_running_loop().run_in_executor(
+        None, _store, task_name, name, data
+    )
+    future.add_done_callback(_stored)
+    logger.bind(task_name=task_name, profile=name).info("task profiled")
+
+
+def _summary(path: Path, limit: int) -> str:
+    """Render a profile's functions with the highest cumulative time."""
+    stats = pstats.Stats(stream=io.StringIO())
+    stats.stats = marshal.loads(gzip.decompress(path.read_bytes()))
+    stats.get_top_level_stats()
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return stats.stream.getvalue()
+
+
+_name_re = re.compile(r"^(?P<recorded_at>[0-9T.]+)-(?P<task_id>[0-9a-f-]{36})-")
+
+
+def _list(task_name: str, limit: int, top: int) -> List[Dict[str, Any]]:
+    profiles = []
+    for path in sorted(_dir(task_name).glob("*.prof.gz"), reverse=True)[:limit]:
+        name = path.name[: -len(".prof.gz")]
+        match = _name_re.match(name)
+        if match is None:
+            continue
+
+        profiles.append(
+            {
+                "id": name,
+                "task_name": task_name,
+                "task_id": match["task_id"],
+                "recorded_at": dt.strptime(match["recorded_at"], "%Y%m%dT%H%M%S.%f"),
+                "size": path.stat().st_size,
+                "summary": _summary(path, top) if top else None,
+            }
+        )
+
+    return profiles
+
+
+async def list_profiles(
+    task_name: str, limit: int, top: int = 0
+) -> List[Dict[str, Any]]:
+    """List a Task name's stored profiles, most recent first.
+
+    Each comes with a summary of its `top` most time consuming functions.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _list, task_name, limit, top)
+
+
+async def read_profile(task_name: str, profile_id: str) -> Optional[bytes]:
+    """Read a stored profile, gzipped, in the format `pstats` loads."""
+    if "/" in profile_id or profile_id.startswith("."):
+        return None
+
+    path = _dir(task_name) / f"{profile_id}.prof.gz"
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(None, path.read_bytes)
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,184 @@
+"""Provides progress reported by Tasks while they run.
+
+Progress lives in the `task_progress` table, apart from the Task, as the Task
+row is locked by the runner for the whole run. Each update is written in a
+short transaction of its own, at most once per `progress_min_interval` per
+Task. Updates reported meanwhile are coalesced, only the latest one being
+written once the interval elapses. Each written update is pushed to the
+Task's flow subscribers as well, notified on the primary database, where
+replicas listen, once written to the Flow's shard. Progress is dropped once
+the run is over.
+"""
+
+import asyncio
+import contextlib
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, NamedTuple, Optional
+
+import sqlalchemy as sql
+
+import orch.config as conf
+import orch.sharding as sharding
+from orch.database import async_session
+from orch.logger import logger
+from orch.models.status import Status
+
+_save = sql.text(
+    """
+    INSERT INTO task_progress (task_id, flow_id, fraction, detail, updated_at)
+    VALUES (:task_id, :flow_id, :fraction, :detail, now())
+    ON CONFLICT (task_id) DO UPDATE SET
+        fraction = excluded.fraction,
+        detail = excluded.detail,
+        updated_at = excluded.updated_at
+    """
+)
+
+_load = sql.text(
+    "SELECT task_id, fraction, detail FROM task_progress WHERE flow_id = :flow_id"
+)
+
+_clear = sql.text("DELETE FROM task_progress WHERE task_id = :task_id")
+
+_notify = sql.text("SELECT pg_notify(:channel, :payload)")
+
+
+class Progress(NamedTuple):
+    """How far a running Task got."""
+
+    # The fraction of the Task's work done, between 0 and 1.
+    fraction: float
+
+    # What the Task is busy with, if it says.
+    detail: Optional[str]
+
+
+# Progress kept in process memory, by Flow id, then by Task id.
+_local: Dict[uuid.UUID, Dict[uuid.UUID, Progress]] = defaultdict(dict)
+
+
+def _event(flow_id: uuid.UUID, task_id: uuid.UUID, progress: Progress):
+    return {
+        "flow_id": str(flow_id),
+        "flow_status": Status.PENDING.value,
+        "task_id": str(task_id),
+        "progress": progress.fraction,
+        "detail": progress.detail,
+    }
+
+
+async def _store(flow_id: uuid.UUID, task_id: uuid.UUID, progress: Progress):
+    """Write a Task's progress, and push it to the flow's subscribers."""
+    # Imported here, as events depend on the models, which depend on this.
+    import orch.events as events
+
+    event = _event(flow_id, task_id, progress)
+    if conf.storage_backend != "postgres":
+        _local[flow_id][task_id] = progress
+        events.publish([event])
+        return
+
+    params = {"task_id": task_id, "flow_id": flow_id, **progress._asdict()}
+    async with sharding.session(flow_id) as session:
+        await session.execute(_save, params)
+        await session.commit()
+
+    # Replicas listen for flow events on the primary, whatever the flow's shard.
+    async with async_session() as session:
+        await session.execute(
+            _notify, {"channel": events.CHANNEL, "payload": events.dumps(event)}
+        )
+        await session.commit()
+
+    events.publish([event])
+
+
+async def load(flow_id: uuid.UUID) -> Dict[uuid.UUID, Progress]:
+    """Load the progress of a Flow's running Tasks, by Task id."""
+    if conf.storage_backend != "postgres":
+        return dict(_local.get(flow_id, {}))
+
+    async with sharding.session(flow_id) as session:
+        rows = await session.execute(_load, {"flow_id": flow_id})
+        return {
+            task_id: Progress(fraction, detail) for task_id, fraction, detail in rows
+        }
+
+
+async def _drop(flow_id: uuid.UUID, task_id: uuid.UUID) -> None:
+    if conf.storage_backend != "postgres":
+        _local[flow_id].pop(task_id, None)
+        if not _local[flow_id]:
+            del _local[flow_id]
+        return
+
+    async with sharding.session(flow_id) as session:
+        await session.execute(_clear, {"task_id": task_id})
+        await session.commit()
+
+
+class Reporter:
+    """Throttles and coalesces the progress updates of a single run."""
+
+    def __init__(self, flow_id: uuid.UUID, task_id: uuid.UUID):
+        self.flow_id = flow_id
+        self.task_id = task_id
+
+        # The latest update not written yet, if any.
+        self._latest: Optional[Progress] = None
+
+        # When an update was last written, as per `time.monotonic`.
+        self._written_at = float("-inf")
+
+        # Writes the latest update once the interval elapses, if scheduled.
+        self._pending: Optional[asyncio.Task] = None
+
+        self._reported = False
+
+    async def report(self, fraction: float, detail: Optional[str] = None) -> None:
+        """Report progress, written right away unless written lately."""
+        self._latest = Progress(fraction, detail)
+        self._reported = True
+        if self._pending is not None:
+            return  # Coalesced with the pending write.
+
+        wait = self._written_at + conf.progress_min_interval / 1000 - time.monotonic()
+        if wait > 0:
+            self._pending = asyncio.create_task(self._write_later(wait))
+        else:
+            await self._write()
+
+    async def _write_later(self, wait: float) -> None:
+        """Write the latest update once due, until no more are reported."""
+        while self._latest is not None:
+            await asyncio.sleep(wait)
+            await self._write()
+            wait = conf.progress_min_interval / 1000
+
+        self._pending = None
+
+    async def _write(self) -> None:
+        latest, self._latest = self._latest, None
+        self._written_at = time.monotonic()
+        try:
+            await _store(self.flow_id, self.task_id, latest)
+        except Exception as err:
+            logger.opt(exception=err).warning("could not write task progress")
+
+    async def close(self) -> None:
+        """Drop any progress reported, once the run is over."""
+        if self._pending is not None:
+            self._pending.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._pending
+            self._pending = None
+
+        if not self._reported:
+            return
+
+        try:
+            await _drop(self.flow_id, self.task_id)
+        except Exception as err:
+            logger.opt(exception=err).warning("could not drop task progress")
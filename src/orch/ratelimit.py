@@ -0,0 +1,128 @@
+"""Provides token bucket rate limits, shared by all runners.
+
+Buckets live in the `rate_limits` table and are updated atomically by a
+single upsert, in a short transaction of its own, so that no lock is held
+while a rate limited Task runs. Once a bucket is known to be empty, this is
+cached locally until it refills, sparing the database further checks.
+"""
+
+import dataclasses
+import time
+from typing import Dict, Optional, Tuple
+
+import sqlalchemy as sql
+
+import orch.config as conf
+from orch.database import async_session
+
+
+@dataclasses.dataclass(frozen=True)
+class RateLimit:
+    """A token bucket, refilled at `rate` tokens per second up to `burst`."""
+
+    key: str
+    rate: float
+    burst: int = 1
+
+    def __post_init__(self):
+        assert self.key, "rate limit key must be non-empty"
+        assert self.rate > 0, f"rate limit {self.key} rate must be positive"
+        assert self.burst >= 1, f"rate limit {self.key} burst must be positive"
+
+
+_take = sql.text(
+    """
+    INSERT INTO rate_limits AS r (key, tokens, updated_at)
+    VALUES (:key, :burst - 1, clock_timestamp())
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = LEAST(
+            :burst,
+            r.tokens + EXTRACT(EPOCH FROM clock_timestamp() - r.updated_at) * :rate
+        ) - 1,
+        updated_at = clock_timestamp()
+    WHERE LEAST(
+        :burst,
+        r.tokens + EXTRACT(EPOCH FROM clock_timestamp() - r.updated_at) * :rate
+    ) >= 1
+    RETURNING r.tokens
+    """
+)
+
+_refill_time = sql.text(
+    """
+    SELECT (1 - r.tokens - EXTRACT(EPOCH FROM clock_timestamp() - r.updated_at)
+        * :rate) / :rate
+    FROM rate_limits AS r
+    WHERE r.key = :key
+    """
+)
+
+# When buckets known to be empty refill, as per `time.monotonic`, by key.
+_empty_until: Dict[str, float] = {}
+
+# How many Tasks were deferred in a row, and when the last of them is due
+# back, as per `time.monotonic`, by key. Counting starts anew once it is.
+_deferred: Dict[str, Tuple[int, float]] = {}
+
+# Buckets of rate limits enforced within this process only, by key.
+_local: Dict[str, Tuple[float, float]] = {}
+
+
+async def _take_shared(limit: RateLimit) -> Optional[float]:
+    """Take a token from the bucket in the database."""
+    params = {"key": limit.key, "rate": limit.rate, "burst": limit.burst}
+    async with async_session() as session:
+        wait = None
+        if (await session.execute(_take, params)).first() is None:
+            wait = float((await session.execute(_refill_time, params)).scalar() or 0)
+        await session.commit()
+
+    return None if wait is None else max(wait, 0.0)
+
+
+def _take_local(limit: RateLimit) -> Optional[float]:
+    """Take a token from a bucket kept in process memory."""
+    now = time.monotonic()
+    tokens, updated_at = _local.get(limit.key, (limit.burst, now))
+    tokens = min(limit.burst, tokens + (now - updated_at) * limit.rate)
+
+    if tokens < 1:
+        _local[limit.key] = (tokens, now)
+        return (1 - tokens) / limit.rate
+
+    _local[limit.key] = (tokens - 1, now)
+    return None
+
+
+async def acquire(limit: RateLimit) -> Optional[float]:
+    """Take a token from a rate limit's bucket.
+
+    Returns None if a token was taken, or else the number of seconds to defer
+    the Task by. Successive deferrals are spread out at the limit's rate, so
+    that deferred Tasks do not all come back at once. They are counted until
+    the last one deferred is due back, even if other runners take all tokens
+    meanwhile, so that deferrals do not keep growing.
+    """
+    now = time.monotonic()
+    empty_until = _empty_until.get(limit.key, 0.0)
+
+    if empty_until > now:
+        wait = empty_until - now
+    elif conf.storage_backend == "postgres":
+        wait = await _take_shared(limit)
+    else:
+        wait = _take_local(limit)
+
+    if wait is None:
+        _empty_until.pop(limit.key, None)
+        _deferred.pop(limit.key, None)
+        return None
+
+    _empty_until[limit.key] = now + wait
+    deferred, due_at = _deferred.get(limit.key, (0, now))
+    if due_at <= now:
+        deferred = 0
+
+    wait += deferred / limit.rate
+    _deferred[limit.key] = (deferred + 1, now + wait)
+    return wait
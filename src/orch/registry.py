@@ -0,0 +1,131 @@
+"""Provides registries of templates, imported lazily upon first use.
+
+Templates are discovered by name without being imported, either as modules
+of a package or as entry points other distributions register under the
+package's name, e.g. in a `setup.py`:
+
+    entry_points={"orch.tasks": ["my_task = my_package.tasks.my_task"]}
+
+Which templates set a class attribute, such as flow schedules, is found by
+parsing their sources, so that the others are not imported either.
+"""
+
+import ast
+import re
+from importlib import import_module, metadata
+from importlib.util import find_spec
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Set
+
+from orch.logger import logger
+
+# Names of all registered templates, by the module providing them.
+module_names: Dict[str, str] = {}
+
+
+class Registry(Mapping):
+    """Maps template names to templates, importing each upon first access."""
+
+    def __init__(
+        self,
+        package: str,
+        pattern: str,
+        load: Callable[[str, ModuleType], Any],
+    ):
+        self.package = package
+        self.pattern = pattern
+        self._load = load
+        self._modules: Dict[str, str] = {}
+        self._loaded: Dict[str, Any] = {}
+        self._declaring: Dict[str, List[str]] = {}
+        self._discover()
+
+    def _discover(self) -> None:
+        """Find template names and modules, without importing them."""
+        found = {}
+
+        for path in Path(import_module(self.package).__file__).parent.glob("*.py"):
+            # Ignore package internals and templates.
+            if path.name.startswith("__") or path.name == "template.py":
+                continue
+            found[path.stem] = f"{self.package}.{path.stem}"
+
+        for entry_point in metadata.entry_points(group=self.package):
+            found[entry_point.name] = entry_point.value
+
+        for name, module in sorted(found.items()):
+            assert re.match(self.pattern, name), f"bad template name {name}"
+            self._modules[name] = module
+            module_names[module] = name
+
+    def __getitem__(self, name: str) -> Any:
+        loaded = self._loaded.get(name)
+        if loaded is not None:
+            return loaded
+
+        module = import_module(self._modules[name])
+        loaded = self._loaded[name] = self._load(name, module)
+        logger.bind(template_name=name).debug(f"{self.package} template loaded")
+        return loaded
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._modules)
+
+    def __len__(self) -> int:
+        return len(self._modules)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._modules
+
+    def load_all(self) -> None:
+        """Import all templates up front."""
+        for name in self:
+            self[name]
+
+    def declaring(self, attribute: str) -> List[str]:
+        """Get names of templates whose class body sets the given attribute.
+
+        Attributes inherited from classes of other modules are not found.
+        Templates whose source cannot be parsed are deemed to set it.
+        """
+        if attribute not in self._declaring:
+            found = []
+            for name, module in self._modules.items():
+                attributes = _class_attributes(module)
+                if attributes is None or attribute in attributes:
+                    found.append(name)
+            self._declaring[attribute] = found
+
+        return self._declaring[attribute]
+
+
+def _class_attributes(module: str) -> Optional[Set[str]]:
+    """Get names set in a module's class bodies, if its source can be parsed."""
+    try:
+        spec = find_spec(module)
+        with open(spec.origin, encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+    except Exception:
+        return None
+
+    attributes = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.ClassDef):
+            continue
+
+        for statement in node.body:
+            if isinstance(statement, ast.Assign):
+                targets = statement.targets
+            elif isinstance(statement, ast.AnnAssign):
+                targets = [statement.target]
+            else:
+                continue
+            attributes.update(t.id for t in targets if isinstance(t, ast.Name))
+
+    return attributes
+
+
+def name_of(module: str) -> Optional[str]:
+    """Get the name a module's template is registered under, if any."""
+    return module_names.get(module)
@@ -0,0 +1,67 @@
+"""Provides routing of reads to a read-only replica, within bounded staleness.
+
+The replica's replication lag is checked periodically. Reads are routed to
+the primary instead while the lag exceeds `read_max_staleness`, or whenever
+it could not be checked lately.
+"""
+
+import time
+from typing import Optional
+
+import sqlalchemy as sql
+
+import orch.config as conf
+from orch.database import async_read_session
+from orch.logger import logger
+
+# Seconds the replica lags behind, zero if fully caught up with the primary.
+_lag = sql.text(
+    """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+    """
+)
+
+# The replica's lag in seconds, when last checked successfully.
+lag: Optional[float] = None
+
+# When the lag was last checked successfully, as per `time.monotonic`.
+_checked_at = 0.0
+
+
+def usable() -> bool:
+    """Return whether reads may be served by the replica right now."""
+    if async_read_session is None or lag is None:
+        return False
+
+    # Do not trust a lag that was not checked for two periods.
+    if time.monotonic() - _checked_at > 2 * conf.read_lag_check_period / 1000:
+        return False
+
+    return lag * 1000 <= conf.read_max_staleness
+
+
+async def check() -> None:
+    """Check how far the replica lags behind the primary."""
+    global lag, _checked_at
+
+    if async_read_session is None:
+        return
+
+    was_usable = usable()
+    try:
+        async with async_read_session() as session:
+            lag = float((await session.execute(_lag)).scalar() or 0)
+            _checked_at = time.monotonic()
+    except Exception as err:
+        logger.opt(exception=err).warning("could not check replica lag")
+        lag = None
+
+    if usable() != was_usable:
+        logger.bind(replica_lag=lag).info(
+            f"reads routed to {'replica' if usable() else 'primary'}"
+        )
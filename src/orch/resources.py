@@ -0,0 +1,143 @@
+"""Provides resources Task templates declare, to be injected when run.
+
+Shared resources, such as HTTP clients, are created once per process upon
+first use, then reused by all Tasks, and closed when the app shuts down.
+Other resources, such as database sessions, are opened for a single run,
+drawing on a pool shared by the process. A Task template declares resources
+by the names it gets them by:
+
+    resources = {"http": resources.HttpClient("https://example.com")}
+
+    async def __call__(self):
+        resp = await self.resource("http").get("/things")
+"""
+
+import abc
+import asyncio
+import contextlib
+import inspect
+from collections import defaultdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from orch.database import async_session
+from orch.logger import logger
+
+# Shared resources created so far, by key.
+_instances: Dict[str, Any] = {}
+
+# How to close each shared resource created so far, by key.
+_closers: Dict[str, Callable[[Any], Optional[Awaitable[None]]]] = {}
+
+# Locks held while creating shared resources, by key.
+_locks: Dict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+class Resource(abc.ABC):
+    """Something a Task uses while run."""
+
+    @abc.abstractmethod
+    def use(self) -> contextlib.AbstractAsyncContextManager:
+        """Provide the resource for a single run of a Task."""
+
+
+class Shared(Resource):
+    """A resource created once per process, under a key, and then reused."""
+
+    def __init__(
+        self,
+        key: str,
+        create: Callable[[], Any],
+        close: Optional[Callable[[Any], Optional[Awaitable[None]]]] = None,
+    ):
+        self.key = key
+        self._create = create
+        self._close = close
+
+    async def get(self) -> Any:
+        """Get the resource, creating it if need be."""
+        instance = _instances.get(self.key)
+        if instance is not None:
+            return instance
+
+        async with _locks[self.key]:
+            if self.key not in _instances:
+                instance = self._create()
+                if inspect.isawaitable(instance):
+                    instance = await instance
+
+                _instances[self.key] = instance
+                if self._close is not None:
+                    _closers[self.key] = self._close
+                logger.bind(resource=self.key).info("shared resource created")
+
+        return _instances[self.key]
+
+    @contextlib.asynccontextmanager
+    async def use(self) -> AsyncIterator[Any]:
+        yield await self.get()
+
+
+class HttpClient(Shared):
+    """An HTTP client shared by all Tasks using the same base URL.
+
+    Any other arguments are handed to `httpx.AsyncClient` by whichever Task
+    uses the client first.
+    """
+
+    def __init__(self, base_url: str = "", **kwargs):
+        super().__init__(
+            f"http:{base_url}",
+            lambda: httpx.AsyncClient(base_url=base_url, **kwargs),
+            lambda client: client.aclose(),
+        )
+
+
+class DatabaseSession(Resource):
+    """A database session of its own for each run, from the process's pool."""
+
+    @contextlib.asynccontextmanager
+    async def use(self) -> AsyncIterator[Any]:
+        async with async_session() as session:
+            yield session
+
+
+def register(
+    name: str,
+    create: Callable[[], Any],
+    close: Optional[Callable[[Any], Optional[Awaitable[None]]]] = None,
+) -> Shared:
+    """Register a custom shared resource, such as a connection pool.
+
+    Both `create` and `close` may be coroutine functions.
+    """
+    return Shared(f"custom:{name}", create, close)
+
+
+@contextlib.asynccontextmanager
+async def provide(resources: Dict[str, Resource]) -> AsyncIterator[Dict[str, Any]]:
+    """Provide the given resources for a single run, by name."""
+    async with contextlib.AsyncExitStack() as stack:
+        yield {
+            name: await stack.enter_async_context(resource.use())
+            for name, resource in resources.items()
+        }
+
+
+async def close_all() -> None:
+    """Close all shared resources created so far."""
+    for key in list(_instances):
+        instance = _instances.pop(key)
+        close = _closers.pop(key, None)
+        if close is None:
+            continue
+
+        try:
+            closed = close(instance)
+            if inspect.isawaitable(closed):
+                await closed
+        except Exception as err:
+            logger.bind(resource=key).opt(exception=err).error(
+                "could not close resource"
+            )
@@ -0,0 +1,39 @@
+"""Provides retry policies Task templates may declare.
+
+A Task failing with a retryable error is left pending and deferred until its
+backoff elapses, via `retry_at`. The runner moves on right away, so that no
+runner is held and no lock is kept while waiting.
+"""
+
+import dataclasses
+from typing import Optional, Tuple, Type
+
+
+@dataclasses.dataclass(frozen=True)
+class RetryPolicy:
+    """Retries a Task up to `max_attempts` times, with exponential backoff.
+
+    The n-th retry waits `backoff * multiplier ** (n - 1)` seconds, capped at
+    `max_backoff`. Only errors of the `retry_on` types are retried.
+    """
+
+    max_attempts: int = 3
+    backoff: float = 1.0
+    multiplier: float = 2.0
+    max_backoff: float = 300.0
+    retry_on: Tuple[Type[BaseException], ...] = (Exception,)
+
+    def __post_init__(self):
+        assert self.max_attempts >= 1, "max attempts must be positive"
+        assert self.backoff >= 0, "backoff must not be negative"
+        assert self.multiplier >= 1, "backoff multiplier must be at least one"
+
+    def delay(self, err: BaseException, attempt: int) -> Optional[float]:
+        """Get how many seconds to wait before retrying after a failed attempt.
+
+        Returns None if the error is not to be retried.
+        """
+        if attempt >= self.max_attempts or not isinstance(err, self.retry_on):
+            return None
+
+        return min(self.backoff * self.multiplier ** (attempt - 1), self.max_backoff)
@@ -1,4 +1,6 @@
+import asyncio
 import datetime as dt
+import time
 import uuid
 from importlib.metadata import distribution
 from typing import Any, Dict, List, Optional
@@ -7,15 +9,37 @@ import fastapi as fa
 import fastapi_utils.tasks as fastapi_tasks
 from fastapi import Depends
 from fastapi import status as http_status
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
+import orch.admission as admission
+import orch.cache as cache
+import orch.checkpoints as checkpoints
 import orch.config as conf
+import orch.durations as durations
+import orch.events as events
+import orch.profiling as profiling
+import orch.progress as progress
+import orch.replica as replica
+import orch.resources as resources
 import orch.schemas as schemas
-from orch.database import async_session, get_session
+import orch.serialization as serialization
+import orch.subflows as subflows
+import orch.tracing as tracing
+import orch.watchdog as watchdog
+from orch.exceptions import BlobNotFound
+from orch.flows import flows
 from orch.logger import logger
+from orch.models.backends import (
+    Backend,
+    BulkChunk,
+    FlowFilter,
+    UnblockedTask,
+    create,
+    get_backend,
+    get_read_backend,
+)
 from orch.models.flow import Flow
 from orch.models.status import Status
+from orch.tasks import tasks
 from orch.webhook import report_on_flow
 
 app = fa.FastAPI(
@@ -24,6 +48,7 @@ app = fa.FastAPI(
     openapi_url=None,
     docs_url=None,
     redoc_url=None,
+    default_response_class=serialization.JSONResponse,
 )
 
 
@@ -36,13 +61,64 @@ async def index():
 
 
 @app.get("/check", status_code=http_status.HTTP_200_OK)
-async def healthcheck(session: AsyncSession = Depends(get_session)):
+async def healthcheck(backend: Backend = Depends(get_backend)):
     """Returns 200 if all seems ok"""
-    async with session:
-        await session.execute(select(Flow).limit(1))
+    async with backend:
+        await backend.list(FlowFilter(), limit=1)
     return {"healthy": "yes"}
 
 
+async def _get_flow_response(
+    backend: Backend, flow_id: uuid.UUID, resolve_outputs: bool
+) -> cache.Entry:
+    """Get a flow's serialized response, from cache if possible."""
+    found = cache.get(flow_id, resolve_outputs)
+    if found is not None:
+        return found
+
+    async with backend:
+        flow = await backend.get(flow_id)
+        if flow is None:
+            raise fa.HTTPException(status_code=404, detail="no such flow")
+
+        outputs = None
+        if resolve_outputs:
+            try:
+                outputs = await backend.resolve_outputs(
+                    {task.id: task.output for task in flow.tasks}
+                )
+            except BlobNotFound as err:
+                logger.bind(flow_id=flow_id).bind(digest=err.digest).warning(
+                    "task output no longer stored"
+                )
+                raise fa.HTTPException(
+                    status_code=http_status.HTTP_410_GONE,
+                    detail="task output no longer stored",
+                )
+
+        running = None
+        if flow.status() == Status.PENDING:
+            running = await progress.load(flow.id)
+
+        body = serialization.dumpb(
+            schemas.ResponseFlow.from_model(flow, outputs, running).dict()
+        )
+        return cache.put(flow_id, resolve_outputs, flow.status(), body)
+
+
+def _respond(found: cache.Entry, if_none_match: Optional[str]) -> fa.Response:
+    """Respond with a flow, or with a 304 if the client's ETag matches."""
+    if cache.matches(if_none_match, found.etag):
+        return fa.Response(
+            status_code=http_status.HTTP_304_NOT_MODIFIED,
+            headers={"etag": found.etag},
+        )
+
+    return fa.Response(
+        found.body, media_type="application/json", headers={"etag": found.etag}
+    )
+
+
 @app.get(
     "/flows/{flow_id}",
     status_code=http_status.HTTP_200_OK,
@@ -50,15 +126,94 @@ async def healthcheck(session: AsyncSession = Depends(get_session)):
 )
 async def get_flow_by_id(
     flow_id: uuid.UUID,
-    session: AsyncSession = Depends(get_session),
+    resolve_outputs: bool = False,
+    if_none_match: Optional[str] = fa.Header(None),
+    backend: Backend = Depends(get_read_backend),
 ):
-    """Get a flow by its unique id."""
-    async with session:
-        flow = await Flow.get_by_id(session, flow_id)
-        if flow is None:
-            raise fa.HTTPException(status_code=404, detail="no such flow")
+    """Get a flow by its unique id.
 
-        return schemas.ResponseFlow.from_model(flow)
+    Offloaded task outputs are only loaded if `resolve_outputs` is set, with
+    a 410 if any is no longer stored.
+    Finished flows are served from cache, with a 304 if `If-None-Match`
+    matches their ETag. Flows may be read from the read replica, thus be
+    up to `read_max_staleness` milliseconds stale.
+    """
+    found = await _get_flow_response(backend, flow_id, resolve_outputs)
+    return _respond(found, if_none_match)
+
+
+@app.get(
+    "/flows/{flow_id}/wait",
+    status_code=http_status.HTTP_200_OK,
+    response_model=schemas.ResponseFlow,
+)
+async def wait_for_flow(
+    flow_id: uuid.UUID,
+    timeout: int = fa.Query(
+        conf.flow_wait_max_timeout, ge=0, le=conf.flow_wait_max_timeout
+    ),
+    resolve_outputs: bool = False,
+    if_none_match: Optional[str] = fa.Header(None),
+    backend: Backend = Depends(get_backend),
+):
+    """Get a flow once it finishes, waiting at most `timeout` milliseconds.
+
+    Upon timeout, the flow is returned as is. No queries are made while
+    waiting, the flow's transitions are pushed by the runners instead.
+    """
+    async with events.subscribe(flow_id) as queue:
+        found = await _get_flow_response(backend, flow_id, resolve_outputs)
+        if found.status not in events.TERMINAL:
+            if await events.wait(queue, timeout / 1000):
+                found = await _get_flow_response(backend, flow_id, resolve_outputs)
+
+    return _respond(found, if_none_match)
+
+
+@app.get("/flows/{flow_id}/events", status_code=http_status.HTTP_200_OK)
+async def stream_flow_events(
+    flow_id: uuid.UUID,
+    backend: Backend = Depends(get_backend),
+):
+    """Stream a flow's task status transitions as server-sent events.
+
+    The first event, `flow`, holds the whole flow. Each following `task`
+    event holds a single transition, and each `progress` event the progress
+    a running task reported. The stream ends once the flow finishes.
+    """
+    found = await _get_flow_response(backend, flow_id, False)
+
+    async def stream():
+        if found.status in events.TERMINAL:
+            yield f"event: flow\ndata: {found.body.decode()}\n\n"
+            return
+
+        async with events.subscribe(flow_id) as queue:
+            # Fetch the flow again, as it may have changed before subscribing.
+            current = await _get_flow_response(backend, flow_id, False)
+            yield f"event: flow\ndata: {current.body.decode()}\n\n"
+            if current.status in events.TERMINAL:
+                return
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), conf.flow_events_keepalive / 1000
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                kind = "progress" if "progress" in event else "task"
+                yield f"event: {kind}\ndata: {serialization.dumps(event)}\n\n"
+                if Status(event["flow_status"]) in events.TERMINAL:
+                    return
+
+    return fa.responses.StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"cache-control": "no-cache"},
+    )
 
 
 @app.post(
@@ -69,26 +224,48 @@ async def get_flow_by_id(
 )
 async def run_flow(
     req: schemas.RequestNewFlow,
-    session: AsyncSession = Depends(get_session),
+    backend: Backend = Depends(get_backend),
 ):
-    """Run a flow by its unique name and any provided arguments."""
-    flow = Flow.from_req(req.name, req.args, req.webhook_url, req.priority)
+    """Run a flow by its unique name and any provided arguments.
+
+    Flows given the same `shard_key`, such as a tenant's, are stored in the
+    same shard, when sharded. While too many flows are pending, flows are
+    turned away with a 429, and a `Retry-After` header.
+    """
+    retry_after = admission.admit(req.name, req.priority)
+    if retry_after is not None:
+        logger.bind(flow_name=req.name).bind(retry_after=retry_after).warning(
+            "flow turned away"
+        )
+        raise fa.HTTPException(
+            status_code=http_status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="too many pending flows",
+            headers={"retry-after": str(retry_after)},
+        )
 
-    async with session:
-        session.add(flow)
-        await session.commit()
+    flow = Flow.from_req(
+        req.name, req.args, req.webhook_url, req.priority, req.run_at, req.shard_key
+    )
+
+    async with backend:
+        with tracing.span("flow.submit", flow.id, tracing.SERVER, flow_name=flow.name):
+            await backend.insert([flow])
+            await backend.commit()
         logger.bind(flow_name=flow.name).bind(args=str(req.args)).bind(
             flow_id=str(flow.id)
         ).info("flow received")
 
-        return schemas.ResponseFlow.from_model(flow)
+        return serialization.JSONResponse(
+            schemas.ResponseFlow.from_model(flow).dict(exclude_unset=True),
+            status_code=http_status.HTTP_201_CREATED,
+        )
 
 
 @app.post("/hooks/flow/{flow_id}", status_code=http_status.HTTP_200_OK)
 async def unblock_flow_by_id(
     flow_id: uuid.UUID,
     req: Dict[str, Any],
-    session: AsyncSession = Depends(get_session),
+    backend: Backend = Depends(get_backend),
 ):
     """Handles a generic flow webhook call.
 
@@ -96,8 +273,8 @@ async def unblock_flow_by_id(
     """
     logger.bind(flow_id=str(flow_id)).bind(args=str(req)).info("flow webhook received")
 
-    async with session:
-        flow = await Flow.get_by_id(session, flow_id)
+    async with backend:
+        flow = await backend.get(flow_id, lock=True)
         if flow is None:
             raise fa.HTTPException(status_code=404, detail="no such flow")
 
@@ -105,106 +282,542 @@ async def unblock_flow_by_id(
         if not task:
             raise fa.HTTPException(status_code=400, detail="flow already unblocked")
 
+        before = {task.id: task.status for task in flow.tasks}
         task.args = {"webhook_request_body": req}
         task.status = Status.PENDING
-        session.add(task)
-        await session.commit()
+        task.correlation_key = None
+        transitions = await events.notify(backend, flow, before)
+        await backend.commit()
+        events.publish(transitions)
 
-        return schemas.ResponseFlow.from_model(flow)
+        return serialization.JSONResponse(schemas.ResponseFlow.from_model(flow).dict())
 
 
-@app.get(
-    "/flows",
+async def _unblock(
+    backend: Backend, bodies: Dict[str, Dict[str, Any]]
+) -> schemas.ResponseUnblocked:
+    """Unblock tasks by their correlation keys in a single statement."""
+    async with backend:
+        unblocked = await backend.unblock(bodies)
+        transitions = await events.notify_unblocked(backend, unblocked)
+        await backend.commit()
+        events.publish(transitions)
+
+    for task in unblocked:
+        logger.bind(flow_id=str(task.flow_id)).bind(task_id=str(task.task_id)).bind(
+            correlation_key=task.correlation_key
+        ).info("task unblocked")
+
+    return schemas.ResponseUnblocked.from_tasks(unblocked, bodies)
+
+
+@app.post(
+    "/hooks/correlate/{key}",
     status_code=http_status.HTTP_200_OK,
-    response_model=schemas.ResponseExecutedFlows,
+    response_model=schemas.ResponseUnblocked,
 )
-async def get_executed_flows(
-    session: AsyncSession = Depends(get_session),
+async def unblock_by_correlation_key(
+    key: str,
+    req: Dict[str, Any],
+    backend: Backend = Depends(get_backend),
+):
+    """Handles a webhook call addressed by correlation key.
+
+    The provided data is supplied to every blocked task registered under
+    the key. A task is only found once the run in which it blocked commits,
+    so a call arriving earlier is answered with a 425 and a `Retry-After`
+    header, as is one for a key no task registered. Calls are not kept to
+    be delivered later.
+    """
+    logger.bind(correlation_key=key).bind(args=str(req)).info(
+        "correlated webhook received"
+    )
+
+    resp = await _unblock(backend, {key: req})
+    if not resp.count:
+        raise fa.HTTPException(
+            status_code=http_status.HTTP_425_TOO_EARLY,
+            detail="no task blocked on key yet",
+            headers={"retry-after": "1"},
+        )
+
+    return serialization.JSONResponse(resp.dict())
+
+
+@app.post(
+    "/hooks:batch",
+    status_code=http_status.HTTP_200_OK,
+    response_model=schemas.ResponseUnblocked,
+)
+async def unblock_batch(
+    req: List[schemas.RequestUnblock],
+    backend: Backend = Depends(get_backend),
+):
+    """Handles many webhook calls addressed by correlation key at once.
+
+    Keys with no blocked task are listed as `unmatched`, for them to be
+    retried, as their tasks may not have finished blocking yet. If a key is
+    given more than once, its last provided data is used.
+    """
+    if len(req) > conf.hooks_batch_max_size:
+        raise fa.HTTPException(
+            status_code=400,
+            detail=f"at most {conf.hooks_batch_max_size} hooks allowed per batch",
+        )
+
+    logger.bind(hooks=len(req)).info("batched webhooks received")
+
+    resp = await _unblock(backend, {item.correlation_key: item.body for item in req})
+    return serialization.JSONResponse(resp.dict())
+
+
+def _flow_filter(
     name: Optional[str] = None,
-    ids: Optional[List[uuid.UUID]] = None,
+    ids: Optional[List[uuid.UUID]] = fa.Query(None),
     created_from: Optional[dt.datetime] = None,
     created_to: Optional[dt.datetime] = None,
     priority: Optional[int] = None,
+    status: Optional[Status] = None,
+    parent_id: Optional[uuid.UUID] = None,
+) -> FlowFilter:
+    """Get the criteria flows are filtered by from query parameters."""
+    return FlowFilter(
+        name=name,
+        ids=ids,
+        created_from=created_from,
+        created_to=created_to,
+        priority=priority,
+        status=status,
+        parent_id=parent_id,
+    )
+
+
+@app.get(
+    "/flows",
+    status_code=http_status.HTTP_200_OK,
+    response_model=schemas.ResponseExecutedFlows,
+)
+async def get_executed_flows(
+    backend: Backend = Depends(get_read_backend),
+    filters: FlowFilter = Depends(_flow_filter),
 ):
-    """Return a list of executed flows matching given criteria."""
+    """Return a list of executed flows matching given criteria.
 
-    query = select(Flow).order_by(Flow.created_at.desc())
+    Flows may be read from the read replica, thus be slightly stale. When
+    sharded, flows are listed from all shards and merged.
+    """
+    async with backend:
+        items = await backend.list(filters)
+        return serialization.JSONResponse(
+            schemas.ResponseExecutedFlows(
+                count=len(items),
+                flows=[schemas.ResponseFlow.from_model(flow) for flow in items],
+            ).dict()
+        )
 
-    if name:
-        query = query.filter(Flow.name == name)
 
-    if ids:
-        query = query.filter(Flow.id.in_(ids))
+def _bulk(operation: str, filters: FlowFilter, backend: Backend) -> fa.Response:
+    """Apply a bulk operation to matching flows, a chunk per transaction.
 
-    if created_from:
-        query = query.filter(Flow.created_at >= created_from)
+    Each chunk is committed on its own, so that rows are not locked for long
+    and progress is kept if interrupted. The operation only applies to flows
+    as they were when it started, lest it never ends while runners change
+    them meanwhile. Flows being run are skipped. Progress
+    is streamed as a JSON line per chunk, then a final one with the totals.
+    The parents of cancelled child flows are released within the same chunk.
+    """
+    if not filters:
+        raise fa.HTTPException(
+            status_code=400, detail="at least one filter must be provided"
+        )
 
-    if created_to:
-        query = query.filter(Flow.created_at <= created_to)
+    apply_chunk = getattr(backend, f"{operation}_chunk")
+
+    async def stream():
+        flows = tasks = 0
+        until = dt.datetime.utcnow()
+        async with backend:
+            while True:
+                chunk = await apply_chunk(filters, conf.bulk_chunk_size, until)
+                if not chunk.flows:
+                    break
+
+                unblocked = await _release_cancelled_parents(backend, chunk)
+                transitions = await events.notify_bulk(backend, chunk)
+                transitions += await events.notify_unblocked(backend, unblocked)
+                await backend.commit()
+                events.publish(transitions)
+
+                flows += len(chunk.flows)
+                tasks += chunk.tasks
+                logger.bind(flows=len(chunk.flows)).bind(tasks=chunk.tasks).info(
+                    f"bulk {operation} chunk done"
+                )
+                yield serialization.dumpb(
+                    {"flows": len(chunk.flows), "tasks": chunk.tasks}
+                ) + b"\n"
 
-    if priority is not None:
-        query = query.filter(Flow.priority == priority)
+        logger.bind(flows=flows).bind(tasks=tasks).info(f"bulk {operation} done")
+        yield serialization.dumpb({"done": True, "flows": flows, "tasks": tasks})
+        yield b"\n"
 
-    async with session:
-        items = (await session.execute(query)).fetchall()
-        return schemas.ResponseExecutedFlows(
-            count=len(items),
-            flows=[
-                schemas.ResponseFlow.from_model(flow._mapping[schemas.Flow])
-                for flow in items
-            ],
-        )
+    return fa.responses.StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.post("/flows:retry", status_code=http_status.HTTP_200_OK)
+async def retry_flows(
+    backend: Backend = Depends(get_backend),
+    filters: FlowFilter = Depends(_flow_filter),
+):
+    """Retry the failed tasks of all flows matching given criteria."""
+    return _bulk("retry", filters, backend)
+
+
+@app.post("/flows:cancel", status_code=http_status.HTTP_200_OK)
+async def cancel_flows(
+    backend: Backend = Depends(get_backend),
+    filters: FlowFilter = Depends(_flow_filter),
+):
+    """Cancel the pending and blocked tasks of all unfinished matching flows."""
+    return _bulk("cancel", filters, backend)
+
+
+@app.post("/flows:purge", status_code=http_status.HTTP_200_OK)
+async def purge_flows(
+    backend: Backend = Depends(get_backend),
+    filters: FlowFilter = Depends(_flow_filter),
+):
+    """Delete all finished flows matching given criteria, with their tasks."""
+    return _bulk("purge", filters, backend)
+
+
+@app.get("/debug/loop", status_code=http_status.HTTP_200_OK)
+async def get_loop_stats():
+    """Get the event loop lag histogram and the tasks that stalled the loop.
+
+    Histogram buckets are cumulative, by upper bound in milliseconds.
+    """
+    return watchdog.monitor.stats()
+
+
+@app.get("/debug/traces/{flow_id}", status_code=http_status.HTTP_200_OK)
+async def get_flow_trace(flow_id: uuid.UUID):
+    """Get a flow's trace in OTLP JSON form, if kept in memory."""
+    trace = tracing.get_trace(flow_id)
+    if trace is None:
+        raise fa.HTTPException(status_code=404, detail="no such trace")
+
+    return trace
+
+
+@app.get("/debug/profiles", status_code=http_status.HTTP_200_OK)
+async def get_task_profiles(
+    task: str,
+    limit: int = fa.Query(20, ge=1),
+    top: int = fa.Query(0, ge=0),
+):
+    """List a task's stored profiles, most recent first.
+
+    With `top`, each comes with a summary of its most time consuming
+    functions. Tasks are profiled if listed in `profile_tasks`.
+    """
+    if task not in tasks:
+        raise fa.HTTPException(status_code=404, detail="no such task")
+
+    profiles = await profiling.list_profiles(task, limit, top)
+    return {"count": len(profiles), "profiles": profiles}
+
+
+@app.get("/debug/profiles/{task}/{profile_id}", status_code=http_status.HTTP_200_OK)
+async def get_task_profile(task: str, profile_id: str):
+    """Download a stored profile, to be gunzipped and loaded with `pstats`."""
+    data = None
+    if task in tasks:
+        data = await profiling.read_profile(task, profile_id)
+    if data is None:
+        raise fa.HTTPException(status_code=404, detail="no such profile")
+
+    return fa.Response(
+        data,
+        media_type="application/gzip",
+        headers={"content-disposition": f'attachment; filename="{profile_id}.prof.gz"'},
+    )
+
+
+@app.on_event("startup")
+async def listen_for_flow_events():
+    """Start receiving flow transitions made by other replicas."""
+    if conf.storage_backend == "postgres":
+        events.start()
+
+
+@app.on_event("shutdown")
+async def stop_listening_for_flow_events():
+    await events.stop()
+
+
+@app.on_event("startup")
+@fastapi_tasks.repeat_every(seconds=conf.read_lag_check_period / 1000)
+async def check_replica_lag():
+    """Route reads to the primary while the replica lags too far behind."""
+    await replica.check()
+
+
+@app.on_event("startup")
+@fastapi_tasks.repeat_every(seconds=conf.admission_refresh_period / 1000)
+async def count_pending_flows():
+    """Count pending flows, for admission control to turn flows away."""
+    if admission.enabled():
+        await admission.refresh()
+
+
+@app.on_event("startup")
+@fastapi_tasks.repeat_every(seconds=conf.duration_stats_flush_period / 1000)
+async def flush_duration_stats():
+    """Share task and flow durations with other replicas, for ETAs and scheduling."""
+    await durations.flush()
+
+
+@app.on_event("startup")
+async def start_loop_monitor():
+    watchdog.monitor.start()
+
+
+@app.on_event("shutdown")
+async def stop_loop_monitor():
+    await watchdog.monitor.stop()
+
+
+@app.on_event("shutdown")
+async def close_shared_resources():
+    await resources.close_all()
+
+
+@app.on_event("shutdown")
+def flush_spans():
+    tracing.flush()
+
+
+async def _release_parent(backend: Backend, flow: Flow) -> List[UnblockedTask]:
+    """Unblock the Task waiting on a child flow, once the child finishes.
+
+    This is done in the unit of work finishing the child. The parent's Task
+    is handed the child's result, with its final output.
+    """
+    status = flow.status()
+    if flow.parent_id is None or status not in events.TERMINAL:
+        return []
+
+    last = flow.tasks[-1]
+    output = (await backend.resolve_outputs({last.id: last.output}))[last.id]
+    result = subflows.result(flow.id, flow.name, status.value, output)
+    return await backend.unblock({subflows.key(flow.id): result})
+
+
+async def _release_cancelled_parents(
+    backend: Backend, chunk: BulkChunk
+) -> List[UnblockedTask]:
+    """Unblock the Tasks waiting on child flows cancelled in bulk."""
+    if not chunk.children:
+        return []
+
+    return await backend.unblock(
+        {
+            subflows.key(flow_id): subflows.result(
+                flow_id, name, Status.FAILURE.value, {"error": "cancelled"}
+            )
+            for flow_id, name in chunk.children.items()
+        }
+    )
+
+
+async def _clear_checkpoints(flow: Flow) -> None:
+    """Drop checkpoints of tasks whose success was just committed.
+
+    Until then, a task is rerun from its checkpoint should the runner fail.
+    """
+    for task in flow.tasks:
+        if not task.checkpointed:
+            continue
+
+        task.checkpointed = False
+        try:
+            await checkpoints.clear(task.id)
+        except Exception as err:
+            logger.opt(exception=err).warning("could not clear task checkpoint")
+
+
+async def _webhook_outputs(
+    backend: Backend, flow: Flow
+) -> Dict[uuid.UUID, Dict[str, Any]]:
+    """Load a flow's offloaded task outputs, for its webhook to carry them.
+
+    Outputs no longer stored are replaced with an error.
+    """
+    outputs = {task.id: task.output for task in flow.tasks}
+    try:
+        return await backend.resolve_outputs(outputs)
+    except BlobNotFound:
+        pass  # Tell which outputs are missing, one at a time.
+
+    resolved = {}
+    for task_id, output in outputs.items():
+        try:
+            resolved.update(await backend.resolve_outputs({task_id: output}))
+        except BlobNotFound as err:
+            logger.bind(flow_id=str(flow.id)).bind(task_id=str(task_id)).bind(
+                digest=err.digest
+            ).warning("task output no longer stored")
+            resolved[task_id] = {"error": "task output no longer stored"}
+
+    return resolved
+
+
+async def _run_next_task(
+    backend: Backend, flow: Flow, claim_started_at: int, span: tracing.Span
+) -> None:
+    """Run a claimed flow's next task, then commit and report on it."""
+    claimed_at = time.time_ns()
+    tracing.record("runner.claim", flow.id, claim_started_at, claimed_at)
+
+    # The flow waited since its last transition, at best.
+    last_updated_at = max(task.updated_at for task in flow.tasks)
+    tracing.record(
+        "flow.queue_wait",
+        flow.id,
+        min(tracing.ns(last_updated_at), claim_started_at),
+        claim_started_at,
+    )
+
+    before = {task.id: task.status for task in flow.tasks}
+    status = await flow.run_next_task()
+    span.set(task_status=status and status.value)
+    logger.bind(flow_name=flow.name).bind(flow_id=str(flow.id)).info(
+        f"task status after running: {status}"
+    )
+
+    if flow.child is not None:
+        await backend.insert([flow.child])
+        logger.bind(flow_name=flow.child.name).bind(flow_id=str(flow.child.id)).bind(
+            parent_flow_id=str(flow.id)
+        ).info("child flow started")
+
+    # Webhooks carry outputs in full, loaded before the unit of work ends.
+    report = flow.webhook_url and all(
+        task.status == Status.SUCCESS for task in flow.tasks
+    )
+    outputs = await _webhook_outputs(backend, flow) if report else None
+
+    with tracing.span("runner.commit"):
+        unblocked = await _release_parent(backend, flow)
+        transitions = await events.notify(backend, flow, before)
+        transitions += await events.notify_unblocked(backend, unblocked)
+        await backend.commit()
+    events.publish(transitions)
+    durations.observe(flow, before)
+    await _clear_checkpoints(flow)
+
+    if report:
+        await report_on_flow(flow, outputs)
+
+    logger.bind(flow_name=flow.name).bind(flow_id=str(flow.id)).bind(
+        flow_duration=flow.duration()
+    ).bind(flow_duration_tasks=flow.duration(only_tasks=True)).info(
+        f"flow status: {flow.status()}"
+    )
 
 
 @app.on_event("startup")
 @fastapi_tasks.repeat_every(seconds=conf.tick_period / 1000, raise_exceptions=True)
 async def run_tasks_periodically():
     """Find eligible tasks one by one and run them."""
-    async with async_session() as session:
+    # Write spans of previous ticks out.
+    tracing.flush()
+
+    async with create() as backend:
+        try:
+            woken = await backend.wake()
+            await backend.commit()
+            if woken:
+                logger.bind(tasks=woken).debug("deferred tasks woken up")
+        except Exception as err:
+            logger.opt(exception=err).error("task runner error")
+            return
+
         while True:
             try:
-                flow = await Flow.get_next_eligible(session)
+                claim_started_at = time.time_ns()
+                flow = await backend.claim()
                 if flow is None:
                     return
 
-                status = await flow.run_next_task()
-                logger.bind(flow_name=flow.name).bind(flow_id=str(flow.id)).info(
-                    f"task status after running: {status}"
-                )
-                await session.commit()
-
-                if (
-                    all(task.status == Status.SUCCESS for task in flow.tasks)
-                    and flow.webhook_url
-                ):
-                    await report_on_flow(flow)
-
-                logger.bind(flow_name=flow.name).bind(flow_id=str(flow.id)).bind(
-                    flow_duration=flow.duration()
-                ).bind(flow_duration_tasks=flow.duration(only_tasks=True)).info(
-                    f"flow status: {flow.status()}"
-                )
+                with tracing.span(
+                    "runner.run_next_task", flow.id, flow_name=flow.name
+                ) as span:
+                    await _run_next_task(backend, flow, claim_started_at, span)
 
             except Exception as err:
                 logger.opt(exception=err).error("task runner error")
                 return
 
 
+@app.on_event("startup")
+@fastapi_tasks.repeat_every(seconds=conf.schedule_period / 1000, raise_exceptions=True)
+async def submit_scheduled_flows():
+    """Submit flows for schedule occurrences due within the next period.
+
+    Flows are submitted ahead of time and left deferred until they are due,
+    each occurrence by a single replica. Only the templates declaring
+    schedules are imported.
+    """
+    horizon = dt.datetime.utcnow() + dt.timedelta(milliseconds=conf.schedule_period)
+
+    async with create() as backend:
+        try:
+            submitted = []
+            for name in flows.declaring("schedules"):
+                for schedule in flows[name].schedules:
+                    while True:
+                        occurrence = await backend.claim_occurrence(
+                            schedule.key, schedule.period, horizon
+                        )
+                        if occurrence is None:
+                            break
+
+                        flow = Flow.from_req(
+                            name,
+                            schedule.args,
+                            priority=schedule.priority,
+                            run_at=schedule.run_at(occurrence),
+                        )
+                        submitted.append(flow)
+                        logger.bind(flow_name=name).bind(flow_id=str(flow.id)).bind(
+                            schedule_key=schedule.key, run_at=flow.run_at.isoformat()
+                        ).info("scheduled flow submitted")
+
+            await backend.insert(submitted)
+            await backend.commit()
+
+        except Exception as err:
+            logger.opt(exception=err).error("flow scheduler error")
+
+
 @app.post(
     "/retry/{flow_id}",
     status_code=http_status.HTTP_200_OK,
 )
 async def retry_failed_tasks(
     flow_id: uuid.UUID,
-    session: AsyncSession = Depends(get_session),
+    backend: Backend = Depends(get_backend),
 ):
     logger.bind(flow_id=str(flow_id)).info("retry failed tasks received")
-    async with session:
-        flow = await Flow.get_by_id(session, flow_id)
+    async with backend:
+        flow = await backend.get(flow_id)
         if flow is None:
             raise fa.HTTPException(status_code=404, detail="no such flow")
 
         if any(task.status == Status.FAILURE for task in flow.tasks):
+            before = {task.id: task.status for task in flow.tasks}
             for task in flow.tasks:
                 if task.status == Status.FAILURE:
                     task.status = Status.PENDING
@@ -212,10 +825,15 @@ async def retry_failed_tasks(
                     task.updated_at = dt.datetime.utcnow()
                     task.started_at = None
                     task.finished_at = None
-                    session.add(task)
-
-            await session.commit()
-            return schemas.ResponseFlow.from_model(flow)
+                    task.retry_at = None
+                    task.attempt = 0
+
+            transitions = await events.notify(backend, flow, before)
+            await backend.commit()
+            events.publish(transitions)
+            return serialization.JSONResponse(
+                schemas.ResponseFlow.from_model(flow).dict()
+            )
         else:
             raise fa.HTTPException(
                 status_code=400,
@@ -0,0 +1,38 @@
+"""Provides recurring schedules Flow templates may declare.
+
+Occurrences are claimed ahead of time, a tick before they are due, by a
+single replica at a time, and submitted as Flows with a `run_at`. Those are
+left out of the dequeue query until due. Each occurrence is delayed by a
+random jitter, so that Flows scheduled on the same period do not all become
+due at once.
+"""
+
+import dataclasses
+import random
+from datetime import datetime as dt
+from datetime import timedelta
+from typing import Any, Dict
+
+
+@dataclasses.dataclass(frozen=True)
+class Schedule:
+    """Submits a Flow every `every` seconds, `jitter` seconds late at most."""
+
+    key: str
+    every: float
+    args: Dict[str, Any] = dataclasses.field(default_factory=dict)
+    jitter: float = 0.0
+    priority: int = 0
+
+    def __post_init__(self):
+        assert self.key, "schedule key must be non-empty"
+        assert self.every > 0, f"schedule {self.key} period must be positive"
+        assert self.jitter >= 0, f"schedule {self.key} jitter must not be negative"
+
+    @property
+    def period(self) -> timedelta:
+        return timedelta(seconds=self.every)
+
+    def run_at(self, occurrence: dt) -> dt:
+        """Get when to run the Flow submitted for an occurrence."""
+        return occurrence + timedelta(seconds=random.uniform(0, self.jitter))
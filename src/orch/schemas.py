@@ -1,14 +1,16 @@
 import datetime
 import uuid
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional
 
 import pydantic as pyd
 from typing_extensions import Literal
 
 from orch.flows import flows
+from orch.models.backends import UnblockedTask
 from orch.models.flow import Flow
 from orch.models.status import Status
 from orch.models.task import Task
+from orch.progress import Progress
 from orch.tasks import tasks
 
 
@@ -22,12 +24,20 @@ class RequestNewFlow(Base):
     args: Dict[pyd.constr(strict=True, min_length=1), Any]
     webhook_url: Optional[pyd.AnyHttpUrl] = None
     priority: Optional[int] = 0
+    run_at: Optional[datetime.datetime] = None
+    shard_key: Optional[pyd.constr(strict=True, min_length=1)] = None
 
     @pyd.validator("name")
     def name_must_match_existing_flow(cls, v):
         assert v in flows, f"no such flow: {v}"
         return v
 
+    @pyd.validator("run_at")
+    def run_at_must_be_utc(cls, v):
+        if v is not None and v.tzinfo is not None:
+            v = v.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+        return v
+
     @pyd.root_validator
     def args_must_match_flow_schema(cls, vals):
         assert "name" in vals, "no valid flow name provided"
@@ -46,40 +56,76 @@ class ResponseTask(Base):
     args: Dict[str, Any]
     updated_at: datetime.datetime
     finished_at: Optional[datetime.datetime] = None
+    attempt: pyd.conint(ge=0) = 0
+    retry_at: Optional[datetime.datetime] = None
+    progress: Optional[pyd.confloat(ge=0, le=1)] = None
+    progress_detail: Optional[str] = None
 
     @staticmethod
-    def from_model(task: Task) -> "ResponseTask":
+    def from_model(
+        task: Task,
+        output: Optional[Dict[str, Any]] = None,
+        progress: Optional[Progress] = None,
+    ) -> "ResponseTask":
         return ResponseTask(
             id=task.id,
             args=task.args,
             name=task.name,
             ordering=task.ordering,
             status=task.status.value,
-            output=task.output,
+            output=task.output if output is None else output,
             updated_at=task.updated_at,
             finished_at=task.finished_at,
+            attempt=task.attempt or 0,
+            retry_at=task.retry_at,
+            progress=progress and progress.fraction,
+            progress_detail=progress and progress.detail,
         )
 
 
 class ResponseFlow(RequestNewFlow):
     id: uuid.UUID
     created_at: datetime.datetime
+    parent_id: Optional[uuid.UUID] = None
     status: Literal[tuple(status.value for status in Status)]
     tasks: Optional[List[ResponseTask]]
     output: Optional[Dict[str, Any]]
+    eta: Optional[datetime.datetime] = None
     is_valid: Optional[bool]
 
     @staticmethod
-    def from_model(flow: Flow) -> "ResponseFlow":
+    def from_model(
+        flow: Flow,
+        outputs: Optional[Dict[uuid.UUID, Dict[str, Any]]] = None,
+        progress: Optional[Dict[uuid.UUID, Progress]] = None,
+    ) -> "ResponseFlow":
+        """Build a response from a Flow.
+
+        Offloaded Task outputs are returned as references, unless resolved
+        ones are provided via `outputs`, keyed by Task id. So is the progress
+        of running Tasks. Pending Flows are given an ETA, if it can be told.
+        """
+        outputs = outputs or {}
+        progress = progress or {}
+        final_output = outputs.get(flow.tasks[-1].id, flow.final_output())
+
         return ResponseFlow(
             id=flow.id,
             name=flow.name,
             args=flow.args,
             created_at=flow.created_at,
             webhook_url=flow.webhook_url,
+            run_at=flow.run_at,
+            parent_id=flow.parent_id,
             status=flow.status().value,
-            tasks=[ResponseTask.from_model(task) for task in flow.tasks],
-            output=flow.final_output(),
+            tasks=[
+                ResponseTask.from_model(
+                    task, outputs.get(task.id), progress.get(task.id)
+                )
+                for task in flow.tasks
+            ],
+            output=final_output,
+            eta=flow.eta(),
         )
 
 
@@ -99,6 +145,44 @@ class ResponseExecutedFlows(Base):
     flows: List[ResponseFlow]
 
 
+class RequestUnblock(Base):
+    correlation_key: pyd.constr(strict=True, min_length=1)
+    body: Dict[str, Any]
+
+
+class ResponseUnblockedTask(Base):
+    flow_id: uuid.UUID
+    task_id: uuid.UUID
+    name: pyd.constr(strict=True, min_length=1)
+    correlation_key: pyd.constr(strict=True, min_length=1)
+
+
+class ResponseUnblocked(Base):
+    count: pyd.conint(ge=0)
+    tasks: List[ResponseUnblockedTask]
+    unmatched: List[str] = []
+
+    @staticmethod
+    def from_tasks(
+        tasks: List[UnblockedTask], keys: Iterable[str] = ()
+    ) -> "ResponseUnblocked":
+        """Build a response, telling which of the given keys matched no Task."""
+        matched = {task.correlation_key for task in tasks}
+        return ResponseUnblocked(
+            count=len(tasks),
+            unmatched=sorted(set(keys) - matched),
+            tasks=[
+                ResponseUnblockedTask(
+                    flow_id=task.flow_id,
+                    task_id=task.task_id,
+                    name=task.name,
+                    correlation_key=task.correlation_key,
+                )
+                for task in tasks
+            ],
+        )
+
+
 class ResponseError(Base):
     status_code: pyd.conint(strict=True, ge=100, le=999)
     message: pyd.constr(strict=True, min_length=1)
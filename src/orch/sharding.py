@@ -0,0 +1,57 @@
+"""Provides routing of Flows to one of several databases, by hashing ids.
+
+Flows are spread across the primary database and those listed in
+`async_shard_database_urls`, each a shard. A Flow's shard is its id's hash,
+and its Tasks' ids are drawn to hash to the same shard, so that any of them
+is routed directly. A Flow given a shard key, such as a tenant's, has its id
+drawn to hash to that key's shard instead, keeping the key's Flows together.
+
+Each shard is migrated on its own. Schedules, rate limits and flow events
+are coordinated on the primary database. Shards cannot be added once Flows
+are stored, as Flows would then hash to other shards.
+
+The memory backend keeps a store per shard, to try sharding out.
+"""
+
+import uuid
+import zlib
+from typing import List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import orch.config as conf
+from orch.database import async_shard_sessions
+
+# How many shards Flows are spread across.
+count = len(async_shard_sessions)
+
+# Shards this replica's runner claims Flows from, all unless `runner_shards`
+# lists some.
+assigned: List[int] = sorted(int(shard) for shard in conf.runner_shards) or list(
+    range(count)
+)
+
+assert all(0 <= shard < count for shard in assigned), "no such runner shard"
+
+
+def of(id_: uuid.UUID) -> int:
+    """Get the shard of a Flow or Task, by its id."""
+    return id_.int % count
+
+
+def of_key(key: str) -> int:
+    """Get the shard of a shard key."""
+    return zlib.crc32(key.encode()) % count
+
+
+def new_id(shard: Optional[int] = None) -> uuid.UUID:
+    """Draw a random id hashing to the given shard, if any."""
+    while True:
+        id_ = uuid.uuid4()
+        if shard is None or of(id_) == shard:
+            return id_
+
+
+def session(id_: uuid.UUID) -> AsyncSession:
+    """Open a session on the database of a Flow or Task."""
+    return async_shard_sessions[of(id_)]()
@@ -0,0 +1,40 @@
+"""Provides child Flows, started by a Task which waits for them to finish.
+
+A Task starting a child Flow blocks on a correlation key naming the child.
+The child is inserted along with the blocked Task, in the same transaction,
+on the same shard. Once the child finishes, the runner that finished it
+unblocks its parent in the transaction that finishes the child, handing it
+the child's result. No webhook nor polling is involved.
+"""
+
+import uuid
+from typing import Any, Dict, NamedTuple, Optional
+
+
+class ChildFlow(NamedTuple):
+    """A Flow started by a Task."""
+
+    id: uuid.UUID
+    name: str
+    args: Dict[str, Any]
+    priority: int
+
+
+def key(flow_id: uuid.UUID) -> str:
+    """Get the correlation key a parent Task blocks on until its child ends."""
+    return f"flow:{flow_id}"
+
+
+def result(
+    flow_id: uuid.UUID, name: str, status: str, output: Optional[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """Describe how a child Flow ended, as handed to its parent Task.
+
+    It replaces the parent Task's arguments, as any webhook call's body does.
+    """
+    return {
+        "flow_id": str(flow_id),
+        "name": name,
+        "status": status,
+        "output": output or {},
+    }
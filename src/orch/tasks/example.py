@@ -15,8 +15,10 @@ class Task(TaskTemplate):
         dummy_slept: float
 
     async def __call__(self) -> Output:
-        """Sleeps for a given amount of milliseconds."""
+        """Sleeps for a given amount of milliseconds, reporting progress."""
         started_at = dt.utcnow()
-        await asyncio.sleep(self.wait_time / 1000.0)
+        for step in range(10):
+            await self.report_progress(step / 10, f"slept {step} tenths")
+            await asyncio.sleep(self.wait_time / 10000.0)
         slept_for = (dt.utcnow() - started_at).total_seconds() * 1000
         return Task.Output(dummy_id=self.unique_id, dummy_slept=slept_for)
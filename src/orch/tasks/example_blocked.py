@@ -7,12 +7,15 @@ from orch.tasks.template import TaskTemplate
 
 class Task(TaskTemplate):
     webhook_request_body: Optional[Dict[str, Any]] = None
+    correlation_key: Optional[str] = None
 
     class Output(TaskTemplate.Output):
         unblocked_due_to: Dict[str, Any]
 
     async def __call__(self) -> Optional[Output]:
         if self.webhook_request_body is None:
+            if self.correlation_key:
+                self.correlate(self.correlation_key)
             return None
 
         return Task.Output(unblocked_due_to=self.webhook_request_body)
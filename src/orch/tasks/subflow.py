@@ -0,0 +1,37 @@
+"""A task that runs another flow as a child, and waits for it to finish.
+
+The child's final output makes the task's output, thus is found in the
+context of the parent flow's next tasks. The task fails if the child does.
+Its arguments are optional, as they are replaced by the child's result once
+it finishes.
+"""
+
+from typing import Any, Dict, Optional
+
+from orch.exceptions import OrchException
+from orch.tasks.template import TaskTemplate
+
+
+class Task(TaskTemplate):
+    flow_name: Optional[str] = None
+    flow_args: Dict[str, Any] = {}
+    flow_priority: Optional[int] = None
+    webhook_request_body: Optional[Dict[str, Any]] = None
+
+    class Output(TaskTemplate.Output):
+        child_flow_id: str
+
+        class Config:
+            extra = "allow"
+
+    async def __call__(self) -> Optional[Output]:
+        if self.webhook_request_body is None:
+            assert self.flow_name, "child flow name must be provided"
+            self.start_flow(self.flow_name, self.flow_args, self.flow_priority)
+            return None
+
+        result = self.webhook_request_body
+        if result["status"] != "success":
+            raise OrchException(f"child flow {result['name']} failed")
+
+        return Task.Output(**{**result["output"], "child_flow_id": result["flow_id"]})
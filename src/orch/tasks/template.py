@@ -1,22 +1,51 @@
 """Provides a Task template that other Tasks inherit."""
 
-import inspect
-from typing import Any, Dict, List, Optional, Set, Type
+import functools
+from typing import Any, ClassVar, Dict, List, Optional, Set, Type
 
 import pydantic as pyd
 
+from orch import checkpoints, sharding
+from orch.ratelimit import RateLimit
+from orch.registry import name_of
+from orch.resources import Resource
+from orch.retries import RetryPolicy
+from orch.subflows import ChildFlow, key
+
 
 class TaskTemplate(pyd.BaseModel):
     """Describes a Task's inputs and base functionality."""
 
-    __slots__ = ("_context",)
+    __slots__ = (
+        "_context",
+        "_correlation_key",
+        "_resources",
+        "_checkpointed",
+        "_progress",
+        "_child",
+    )
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         object.__setattr__(self, "_context", {})
+        object.__setattr__(self, "_correlation_key", None)
+        object.__setattr__(self, "_resources", {})
+        object.__setattr__(self, "_checkpointed", False)
+        object.__setattr__(self, "_progress", None)
+        object.__setattr__(self, "_child", None)
 
     extra: Optional[Dict[str, Any]] = None
 
+    # A rate limit shared by all Tasks declaring the same key, across all
+    # runners. Tasks are deferred while their rate limit is exhausted.
+    rate_limit: ClassVar[Optional[RateLimit]] = None
+
+    # How the Task is retried upon errors. Tasks are not retried by default.
+    retry_policy: ClassVar[Optional[RetryPolicy]] = None
+
+    # Resources provided to the Task while run, by name. See `orch.resources`.
+    resources: ClassVar[Dict[str, Resource]] = {}
+
     class Config:
         extra = "forbid"
 
@@ -33,15 +62,46 @@ class TaskTemplate(pyd.BaseModel):
         raise NotImplementedError("task method `__call__` not implemented")
 
     @classmethod
+    @functools.lru_cache(maxsize=None)
     def get_name(cls):
-        """Return the Task's name"""
+        """Return the Task's name, as registered in `orch.tasks.tasks`"""
         for _cls in [cls] + list(cls.__bases__):
-            cls_name = inspect.getmodule(_cls).__name__
-            if cls_name.startswith("orch.tasks."):
-                return cls_name.split(".")[2]
+            name = name_of(_cls.__module__)
+            if name is not None:
+                return name
 
         raise ValueError("could not determine task name")
 
+    def correlate(self, key: str) -> None:
+        """Register a key by which the Task can be unblocked once it blocks.
+
+        External systems may then call `POST /hooks/correlate/{key}` instead
+        of addressing the Task's flow by its id. Calls made before the Task's
+        run commits find it not blocked yet, and are answered with a 425.
+        """
+        assert key, "correlation key must be non-empty"
+        object.__setattr__(self, "_correlation_key", key)
+
+    def start_flow(
+        self, name: str, args: Dict[str, Any], priority: Optional[int] = None
+    ) -> ChildFlow:
+        """Start a child Flow, and block until it finishes.
+
+        The Task must then return None, to block. Once the child finishes,
+        the Task is run again, given the child's result as its
+        `webhook_request_body` argument. Children run at their parent's
+        priority unless given one.
+        """
+        assert self._child is None, "task already started a child flow"
+        flow_id = self.assert_context("flow_id")
+        if priority is None:
+            priority = self.assert_context("flow").priority
+
+        child = ChildFlow(sharding.new_id(sharding.of(flow_id)), name, args, priority)
+        object.__setattr__(self, "_child", child)
+        self.correlate(key(child.id))
+        return child
+
     def assert_context(self, name: str) -> Optional[Any]:
         """Get a value from the task's context"""
         assert name in self._context, "missing context value: {name}"
@@ -51,6 +111,41 @@ class TaskTemplate(pyd.BaseModel):
         """Get a value from the task's context, or None if not present."""
         return self._context.get(name)
 
+    async def checkpoint(self, state: Dict[str, Any]) -> None:
+        """Durably save the Task's progress as arbitrary JSON.
+
+        Should the run fail, the next one can `restore` it, and resume rather
+        than start over. The checkpoint is dropped once the Task's success is
+        committed.
+        """
+        await checkpoints.save(self.assert_context("task_id"), state)
+        object.__setattr__(self, "_checkpointed", True)
+
+    async def restore(self) -> Optional[Dict[str, Any]]:
+        """Get the state last saved by `checkpoint` in a previous run, if any."""
+        state = await checkpoints.load(self.assert_context("task_id"))
+        if state is not None:
+            object.__setattr__(self, "_checkpointed", True)
+
+        return state
+
+    async def report_progress(
+        self, fraction: float, detail: Optional[str] = None
+    ) -> None:
+        """Report how far the Task got, as a fraction between 0 and 1.
+
+        Clients see it while the Task runs. Updates are throttled, so this may
+        be called as often as convenient.
+        """
+        assert 0 <= fraction <= 1, "progress fraction must be between 0 and 1"
+        assert self._progress is not None, "progress reported while not run"
+        await self._progress.report(fraction, detail)
+
+    def resource(self, name: str) -> Any:
+        """Get a resource the Task declared, while it is run."""
+        assert name in self._resources, f"missing resource: {name}"
+        return self._resources[name]
+
     def tasks(self) -> List["TaskTemplate"]:
         """Returns the task itself."""
         return [self]
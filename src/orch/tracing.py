@@ -0,0 +1,234 @@
+"""Provides trace spans of a flow's stages, exported in OTLP JSON form.
+
+A flow's trace id is its id, so that spans recorded by the API, any runner
+and the webhook all end up in the same trace. Spans nest within the span
+current in their context. The `trace_exporter` conf selects where they go:
+
+- `memory` keeps the latest `trace_memory_size` traces, as served by
+  `GET /debug/traces/{flow_id}`,
+- `file` appends batches of spans to `trace_file`, as lines in the OTLP JSON
+  format collectors import,
+- anything else, the default, disables tracing altogether.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import dataclasses
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+import orch.config as conf
+import orch.serialization as serialization
+from orch.logger import logger
+
+# Kinds of spans, as per OTLP.
+INTERNAL, SERVER, CLIENT = 1, 2, 3
+
+# Spans waiting to be written to the trace file, if any.
+_batch: List["Span"] = []
+
+# Spans of the latest traces, by trace id, if kept in memory.
+_traces: "OrderedDict[str, List[Span]]" = OrderedDict()
+
+# The span current in each context.
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "span", default=None
+)
+
+
+@dataclasses.dataclass
+class Span:
+    """A timed stage of a flow."""
+
+    name: str
+    trace_id: Optional[str]
+    parent_id: Optional[str]
+    kind: int = INTERNAL
+    span_id: str = dataclasses.field(default_factory=lambda: os.urandom(8).hex())
+    start_ns: int = dataclasses.field(default_factory=time.time_ns)
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = dataclasses.field(default_factory=dict)
+    error: Optional[str] = None
+
+    def set(self, flow_id: Optional[uuid.UUID] = None, **attributes) -> None:
+        """Set the span's flow, once known, as well as any attributes."""
+        if flow_id is not None:
+            self.trace_id = flow_id.hex
+        self.attributes.update(attributes)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": key, "value": _otlp_value(val)}
+                for key, val in self.attributes.items()
+                if val is not None
+            ],
+            "status": {"code": 1} if self.error is None else {"code": 2},
+        }
+        if self.parent_id is not None:
+            span["parentSpanId"] = self.parent_id
+        if self.error is not None:
+            span["status"]["message"] = self.error
+
+        return span
+
+
+class _NoopSpan(Span):
+    def set(self, flow_id: Optional[uuid.UUID] = None, **attributes) -> None:
+        pass
+
+
+_noop = _NoopSpan("noop", None, None)
+
+
+def enabled() -> bool:
+    return conf.trace_exporter in ("memory", "file")
+
+
+def ns(when: datetime) -> int:
+    """Convert a naive UTC datetime, as stored, to nanoseconds since epoch."""
+    return int(when.replace(tzinfo=timezone.utc).timestamp() * 1e9)
+
+
+def _otlp_value(val: Any) -> Dict[str, Any]:
+    if isinstance(val, bool):
+        return {"boolValue": val}
+    if isinstance(val, int):
+        return {"intValue": str(val)}
+    if isinstance(val, float):
+        return {"doubleValue": val}
+    return {"stringValue": str(val)}
+
+
+def _otlp(spans: List[Span]) -> Dict[str, Any]:
+    """Wrap spans into an OTLP export request."""
+    service = {"key": "service.name", "value": {"stringValue": conf.application}}
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": [service]},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "orch"},
+                        "spans": [span.to_otlp() for span in spans],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+@contextlib.contextmanager
+def span(
+    name: str, flow_id: Optional[uuid.UUID] = None, kind: int = INTERNAL, **attributes
+) -> Iterator[Span]:
+    """Time a stage within the current span, if any, or else as a root span.
+
+    Spans whose flow is not known by the time they end are dropped.
+    """
+    if not enabled():
+        yield _noop
+        return
+
+    parent = _current.get()
+    current = Span(
+        name,
+        flow_id.hex if flow_id else parent and parent.trace_id,
+        parent and parent.span_id,
+        kind,
+        attributes=dict(attributes),
+    )
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as err:
+        current.error = f"{type(err).__name__}: {err}"
+        raise
+    finally:
+        _current.reset(token)
+        current.end_ns = time.time_ns()
+        _export(current)
+
+
+def record(
+    name: str, flow_id: uuid.UUID, start_ns: int, end_ns: int, **attributes
+) -> None:
+    """Record a stage timed otherwise, such as time spent waiting in queue."""
+    if not enabled():
+        return
+
+    parent = _current.get()
+    _export(
+        Span(
+            name,
+            flow_id.hex,
+            parent and parent.span_id,
+            start_ns=start_ns,
+            end_ns=end_ns,
+            attributes=attributes,
+        )
+    )
+
+
+def _export(span: Span) -> None:
+    if span.trace_id is None:
+        return
+
+    if conf.trace_exporter == "memory":
+        spans = _traces.setdefault(span.trace_id, [])
+        _traces.move_to_end(span.trace_id)
+        spans.append(span)
+        while len(_traces) > conf.trace_memory_size:
+            _traces.popitem(last=False)
+
+    elif conf.trace_exporter == "file":
+        _batch.append(span)
+        if len(_batch) >= conf.trace_file_batch_size:
+            flush()
+
+
+def _write(data: bytes) -> None:
+    with open(conf.trace_file, "ab") as f:
+        f.write(data)
+
+
+def _written(future: asyncio.Future) -> None:
+    if future.exception() is not None:
+        logger.opt(exception=future.exception()).error("could not export spans")
+
+
+def flush() -> None:
+    """Write batched spans to the trace file, off the event loop."""
+    global _batch
+    if not _batch:
+        return
+
+    data = serialization.dumpb(_otlp(_batch)) + b"\n"
+    _batch = []
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        _write(data)
+        return
+
+    loop.run_in_executor(None, _write, data).add_done_callback(_written)
+
+
+def get_trace(flow_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+    """Get a flow's trace kept in memory, in OTLP JSON form, if any."""
+    spans = _traces.get(flow_id.hex)
+    if not spans:
+        return None
+
+    return _otlp(sorted(spans, key=lambda span: span.start_ns))
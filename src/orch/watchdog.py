@@ -0,0 +1,161 @@
+"""Provides an event loop lag monitor, naming the Tasks that stall it.
+
+Tasks run on the same event loop as the API, so a Task doing blocking work
+stalls everything else. A coroutine measures how late the loop wakes it up,
+into a histogram. A thread checks that coroutine keeps beating. Once the loop
+is stalled for longer than `loop_stall_threshold`, the thread inspects the
+loop thread's stack, and attributes the stall to the Task running in it.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+import uuid
+from collections import Counter
+from types import FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+import orch.config as conf
+from orch.logger import logger
+
+# Upper bounds of lag histogram buckets, in milliseconds.
+BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+# Tasks being run, by the id of the frame running them.
+_running: Dict[int, Tuple[str, uuid.UUID]] = {}
+
+
+class _Running:
+    __slots__ = ("_frame_id", "_task")
+
+    def __init__(self, task_name: str, flow_id: uuid.UUID):
+        self._task = (task_name, flow_id)
+
+    def __enter__(self) -> None:
+        self._frame_id = id(sys._getframe(1))
+        _running[self._frame_id] = self._task
+
+    def __exit__(self, *_) -> None:
+        _running.pop(self._frame_id, None)
+
+
+def running(task_name: str, flow_id: uuid.UUID) -> _Running:
+    """Mark the calling frame as running a Task, for stalls to be attributed."""
+    return _Running(task_name, flow_id)
+
+
+class Monitor:
+    """Measures event loop lag and detects stalls."""
+
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.stalls = 0
+
+        # Stalls attributed to Tasks, by Task name.
+        self.offenders: Counter = Counter()
+
+        self._beat = time.monotonic()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopped = threading.Event()
+
+    def observe(self, lag_ms: float) -> None:
+        for i, bound in enumerate(BUCKETS):
+            if lag_ms <= bound:
+                self.buckets[i] += 1
+                break
+
+        self.count += 1
+        self.total += lag_ms
+        self.max = max(self.max, lag_ms)
+
+    async def _measure(self) -> None:
+        """Sleep for fixed intervals, recording how late each wake up is."""
+        interval = conf.loop_lag_interval / 1000
+        while True:
+            started_at = time.monotonic()
+            await asyncio.sleep(interval)
+            self._beat = time.monotonic()
+            self.observe(max(self._beat - started_at - interval, 0.0) * 1000)
+
+    def _culprit(self) -> Tuple[Optional[Tuple[str, uuid.UUID]], List[str]]:
+        """Find the Task the loop thread is running, if any, and where."""
+        frame: Optional[FrameType] = sys._current_frames().get(self._loop_thread)
+        stack = traceback.format_stack(frame, limit=8) if frame else []
+        while frame is not None:
+            task = _running.get(id(frame))
+            if task is not None:
+                return task, stack
+            frame = frame.f_back
+
+        return None, stack
+
+    def _watch(self) -> None:
+        """Check the loop keeps beating, reporting each stall once."""
+        threshold = conf.loop_stall_threshold / 1000
+        stalled_since = None
+
+        while not self._stopped.wait(threshold / 2):
+            beat = self._beat
+            if time.monotonic() - beat < threshold + conf.loop_lag_interval / 1000:
+                continue
+            if stalled_since == beat:
+                continue  # Already reported.
+
+            stalled_since = beat
+            self.stalls += 1
+            task, stack = self._culprit()
+
+            log = logger.bind(loop_stack="".join(stack))
+            if task is not None:
+                self.offenders[task[0]] += 1
+                log = log.bind(task_name=task[0], flow_id=str(task[1]))
+            log.warning("event loop stalled")
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+
+        if conf.loop_debug:
+            # Have asyncio log each callback slower than the threshold.
+            self._loop.set_debug(True)
+            self._loop.slow_callback_duration = conf.loop_stall_threshold / 1000
+
+        self._task = asyncio.create_task(self._measure())
+        threading.Thread(target=self._watch, name="orch-watchdog", daemon=True).start()
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Summarize lag measured so far."""
+        cumulative, buckets = 0, {}
+        for bound, count in zip(BUCKETS, self.buckets):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+
+        return {
+            "lag_ms": {
+                "buckets": buckets,
+                "count": self.count,
+                "sum": self.total,
+                "max": self.max,
+            },
+            "stalls": self.stalls,
+            "offenders": dict(self.offenders.most_common()),
+        }
+
+
+# The monitor of the running app.
+monitor = Monitor()
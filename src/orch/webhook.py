@@ -1,36 +1,51 @@
 import asyncio
-import json
+import uuid
 from datetime import datetime as dt
-
-import httpx
+from typing import Any, Dict, Optional
 
 import orch.config as conf
-from orch import schemas
+import orch.serialization as serialization
+from orch import resources, schemas, tracing
 from orch.logger import logger
 from orch.models.flow import Flow
 from orch.models.status import Status
 
+# A client shared by all webhook calls, reusing connections.
+_client = resources.HttpClient()
+
 
-async def _call(url: str, data: str) -> None:
+async def _call(url: str, data: bytes) -> None:
     """Actually calls the webhook with the provided payload."""
-    async with httpx.AsyncClient(timeout=conf.webhook_num_of_retries / 1000) as client:
-        resp = await client.post(
-            url, headers={"content-type": "application/json"}, json=json.loads(data)
-        )
-        resp.raise_for_status()
+    client = await _client.get()
+    resp = await client.post(
+        url,
+        headers={"content-type": "application/json"},
+        content=data,
+        timeout=conf.webhook_num_of_retries / 1000,
+    )
+    resp.raise_for_status()
 
 
-async def report_on_flow(flow: Flow) -> None:
-    """Calls the webhook URL with the given Flow's data."""
+async def report_on_flow(
+    flow: Flow, outputs: Optional[Dict[uuid.UUID, Dict[str, Any]]] = None
+) -> None:
+    """Calls the webhook URL with the given Flow's data.
+
+    Offloaded Task outputs are sent as resolved in `outputs`, by Task id.
+    """
     assert flow.webhook_url, "flow lacks webhook_url"
 
     call_from = dt.utcnow()
     status = Status.PENDING
 
-    with logger.contextualize(webhook_url=flow.webhook_url, flow_id=str(flow.id)):
+    with logger.contextualize(
+        webhook_url=flow.webhook_url, flow_id=str(flow.id)
+    ), tracing.span("flow.webhook", flow.id, tracing.CLIENT) as span:
         logger.info("Sending flow webhook")
 
-        flow_data = schemas.ResponseFlow.from_model(flow).json()
+        flow_data = serialization.dumpb(
+            schemas.ResponseFlow.from_model(flow, outputs).dict()
+        )
 
         # Try calling the webhook until a 2XX response is received.
         for i in range(conf.webhook_num_of_retries):
@@ -51,6 +66,8 @@ async def report_on_flow(flow: Flow) -> None:
                 )
                 break
 
+        span.set(webhook_status=status.value)
+
         # Log status and duration.
         with logger.contextualize(
             webhook_duration=(dt.utcnow() - call_from).total_seconds(),
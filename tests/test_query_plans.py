@@ -0,0 +1,133 @@
+"""Checks that hot queries are planned on the indexes meant to serve them.
+
+Runs against the database at `ASYNC_DATABASE_URL`, migrated to head, as with
+the variables of `env.default` set. Flows and Tasks are inserted and analyzed
+within a transaction rolled back afterwards, so that the planner weighs
+tables of realistic size, mostly finished, rather than empty ones.
+
+Run with `python -m pytest tests`.
+"""
+
+import asyncio
+import os
+import uuid
+from datetime import datetime as dt
+
+import pytest
+
+if not os.environ.get("ASYNC_DATABASE_URL"):
+    pytest.skip("ASYNC_DATABASE_URL is not set", allow_module_level=True)
+
+import sqlalchemy as sql  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+from sqlalchemy.future import select  # noqa: E402
+from sqlalchemy.sql.expression import ClauseElement, Executable  # noqa: E402
+
+import orch.models.blob as blob  # noqa: E402
+import orch.models.flow as flow  # noqa: E402
+from orch.models.backends.base import FlowFilter  # noqa: E402
+from orch.models.flow import Flow  # noqa: E402
+
+# How many Flows of a single Task each to insert, one in a hundred pending,
+# and as many blocked.
+FLOWS = 10000
+
+_seed = [
+    sql.text(
+        """
+        INSERT INTO flows (id, name, args, created_at, priority)
+        SELECT md5('flow' || i)::uuid, 'flow_' || i % 100, '{}',
+            now() - i * interval '1 second', 0
+        FROM generate_series(1, :flows) AS i
+        """
+    ),
+    sql.text(
+        """
+        INSERT INTO tasks
+            (id, flow_id, name, ordering, status, args, output, updated_at)
+        SELECT md5('task' || i)::uuid, md5('flow' || i)::uuid, 'task_' || i % 10,
+            0,
+            CASE i % 100
+                WHEN 0 THEN 'PENDING'
+                WHEN 1 THEN 'BLOCKED'
+                ELSE 'SUCCESS'
+            END::task_status,
+            '{}', '{}', now()
+        FROM generate_series(1, :flows) AS i
+        """
+    ),
+    sql.text("ANALYZE flows"),
+    sql.text("ANALYZE tasks"),
+]
+
+
+class Explain(Executable, ClauseElement):
+    """The plan of a statement, as `EXPLAIN` tells it."""
+
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def _explain(element, compiler, **kw):
+    return "EXPLAIN " + compiler.process(element.statement, **kw)
+
+
+async def _plan_of(statement, params) -> str:
+    engine = create_async_engine(os.environ["ASYNC_DATABASE_URL"])
+    try:
+        async with engine.connect() as conn:
+            async with conn.begin() as transaction:
+                for seed in _seed:
+                    await conn.execute(seed, {"flows": FLOWS})
+                rows = (await conn.execute(Explain(statement), params)).all()
+                await transaction.rollback()
+    except OSError as err:
+        pytest.skip(f"database unreachable: {err}")
+    finally:
+        await engine.dispose()
+
+    return "\n".join(row[0] for row in rows)
+
+
+def plan_of(statement, params=None) -> str:
+    return asyncio.run(_plan_of(statement, params or {}))
+
+
+def test_next_eligible():
+    plan = plan_of(flow._next_eligible, {"now": dt.utcnow()})
+    assert "ix_tasks_flow_id_pending" in plan, plan
+    assert "ix_tasks_flow_id_name_blocked" in plan, plan
+    assert "Seq Scan on tasks" not in plan, plan
+
+
+def test_next_shortest_expected():
+    plan = plan_of(flow._next_shortest_expected, {"now": dt.utcnow()})
+    assert "ix_tasks_flow_id_pending" in plan, plan
+    assert "Seq Scan on tasks" not in plan, plan
+
+
+def test_blocked_task_by_name():
+    plan = plan_of(
+        flow._blocked_task_by_name, {"flow_id": uuid.uuid4(), "task_name": "task_1"}
+    )
+    assert "ix_tasks_flow_id_name_blocked" in plan, plan
+    assert "Seq Scan on tasks" not in plan, plan
+
+
+def test_flows_by_name():
+    statement = FlowFilter(name="flow_1").apply(
+        select(Flow).order_by(Flow.created_at.desc())
+    )
+    plan = plan_of(statement)
+    assert "ix_flows_name_created_at" in plan, plan
+    assert "Seq Scan on flows" not in plan, plan
+
+
+def test_unreferenced_blobs():
+    plan = plan_of(blob._collect, {"digests": ["digest"]})
+    assert "ix_tasks_output_blob" in plan, plan
+    assert "Seq Scan on tasks" not in plan, plan